@@ -2,17 +2,29 @@ import math
 import os
 import sys
 
+import numpy as np
+
 # הוספת תיקיית השורש לנתיב כדי שנוכל לייבא את מסד הנתונים
 current_dir = os.path.dirname(os.path.abspath(__file__))
 base_dir = os.path.dirname(current_dir)
 if base_dir not in sys.path:
     sys.path.append(base_dir)
 
-# יבוא ישיר וודאי של מחלקת מסד הנתונים מתיקיית catalog
-from catalog.Database import Database
+# יבוא ישיר וודאי של מטמון הקטלוג מתיקיית catalog
+from catalog.catalog_cache import get_catalog
+from calculations.dripper_combos import get_combo_table
+
+ENGINE_REFERENCE = "reference"
+ENGINE_VECTORIZED = "vectorized"
+
+SEGMENTATION_FIXED = "fixed"
+SEGMENTATION_ADAPTIVE = "adaptive"
+SEGMENTATION_CLOSED_FORM = "closed_form"
+# בחירה לפי סוג הקו: קו רציף (פריקה אחידה) - נוסחה סגורה, קו עציצים - חלוקה קבועה
+SEGMENTATION_AUTO = "auto"
 
 class IrrigationCalculator:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, engine=ENGINE_VECTORIZED):
         if db_path is None:
             # נתיב קשיח ודטרמיניסטי למסד הנתונים
             self.db_path = os.path.join(base_dir, "catalog", "components.db")
@@ -23,10 +35,55 @@ class IrrigationCalculator:
         self.MIN_END_PRESSURE = 1.0
         self.SAFETY_MARGIN = 1.15
         
+        # מקדמי ברירת מחדל - משמשים רק אם האביזר חסר בטבלת fittings
         self.K_ELBOW = 1.3
         self.K_TEE = 1.8
         self.K_CONNECTOR = 0.5
 
+        # אביזרי הקטלוג (לפי engineering_symbol) של כל סוג מחבר בקלט
+        self.FITTING_SYMBOLS = {'elbows': "L", 'tees': "T-branch", 'straights': "="}
+        # טבלת K לפי קוטר, נבנית מהקטלוג בשימוש הראשון ומתחדשת רק כשהקטלוג נטען מחדש
+        self._fitting_k_model = None
+
+        # מספר טפטפות מקסימלי לעציץ. השילובים נבנים מדגם אחד בלבד שמתאים לצינורית ספגטי:
+        # PLANTER_DRIPPER_ID הוא מזהה הדגם בקטלוג, וב-None משתמשים בספיקות ברירת המחדל
+        self.MAX_EMITTERS_PER_PLANTER = 3
+        self.PLANTER_DRIPPER_ID = None
+        self.DEFAULT_DRIPPER_FLOWS = (8.0, 4.0, 2.0, 1.0)
+        # טפטפת אינטגרלית יושבת בתוך הצינור - רק דגם חיצוני ניתן לחיבור לעציץ
+        self.PLANTER_DRIPPER_TYPE = "חיצונית לצינור"
+
+        # חלוקה אדפטיבית של קו רציף: מספר מקטעים התחלתי ומקסימלי
+        self.ADAPTIVE_MIN_SEGMENTS = 4
+        self.ADAPTIVE_MAX_SEGMENTS = 5000
+
+        # פתרון ספיקות הטפטפות לפי הלחץ המקומי: לחץ הדירוג של הספיקה הנומינלית ותנאי עצירה
+        self.EMITTER_NOMINAL_PRESSURE = 1.0
+        self.EMITTER_TOLERANCE_LH = 1e-4
+        self.EMITTER_MAX_ITERATIONS = 200
+        # ריסון מינימלי: אם גם צעד קטן כזה לא מקטין את השארית - הפתרון נתקע ועוצרים
+        self.EMITTER_MIN_DAMPING = 1e-6
+
+        # מספר המקטעים בחלוקה הקבועה של קו רציף
+        self.FIXED_SEGMENTS = 50
+
+        # אופטימיזציית קוטר: הצינור הקטן ביותר שנחשב לקו ראשי, ומספר קטעים לקו טלסקופי רציף
+        self.MIN_MAIN_PIPE_MM = 16
+        self.TELESCOPE_SECTIONS = 20
+
+        # מספר התאים (תכנונים x מקטעים) במטריצה אחת של calculate_batch
+        self.BATCH_CHUNK_CELLS = 500_000
+
+        # "vectorized" - חישוב כל המקטעים כמערכי NumPy
+        # "reference" - לולאת המקטעים המקורית, נשמרת לצורך השוואת תוצאות
+        if engine not in (ENGINE_REFERENCE, ENGINE_VECTORIZED):
+            raise ValueError(f"Unknown engine mode: {engine}")
+        self.engine = engine
+
+    def catalog_version(self):
+        """Fingerprint of the catalog content the results are computed from"""
+        return get_catalog(self.db_path).fingerprint
+
     def get_length_classification(self, length_m):
         lower = (int(length_m) // 10) * 10
         upper = lower + 10
@@ -37,18 +94,19 @@ class IrrigationCalculator:
         elif length_m <= 100: nominal = 25
         else: nominal = 32
         
-        # התחברות ל-DB ושליפת הקוטר הפנימי המדויק לטובת חישובי מכניקת זורמים
-        db = Database(self.db_path)
-        pipe_data = db.get_pipe_by_diameter(nominal)
+        return self._catalog_pipe_for_nominal(nominal)
+
+    def _catalog_pipe_for_nominal(self, nominal):
+        # שליפת הקוטר הפנימי המדויק מהקטלוג (נטען מה-DB פעם אחת בתהליך) לטובת חישובי מכניקת זורמים.
+        # אם הקוטר לא קיים בקטלוג - נבחר הקוטר הזמין הקרוב ביותר במקום קוטר משוער
+        pipe_data = get_catalog(self.db_path).get_nearest_pipe(nominal)
+        if pipe_data is None:
+            raise ValueError("The pipe catalog is empty")
         
-        if pipe_data:
-            # אינדקס 4 הוא ה- internal_diameter_mm כפי שהוגדר בטבלה
-            internal = pipe_data[4] 
-        else:
-            # מקדם גיבוי למקרה שהצינור לא קיים בטבלה
-            internal = nominal * 0.85 
-            
-        return nominal, internal
+        # אינדקס 2 הוא nominal_diameter_mm ואינדקס 4 הוא internal_diameter_mm כפי שהוגדרו בטבלה
+        if pipe_data[2] != nominal:
+            nominal = int(pipe_data[2]) if float(pipe_data[2]).is_integer() else pipe_data[2]
+        return nominal, pipe_data[4]
 
     def _select_spaghetti_by_main(self, main_pipe_mm):
         if main_pipe_mm == 16: return "5mm"
@@ -56,47 +114,78 @@ class IrrigationCalculator:
         elif main_pipe_mm >= 32: return "7mm"
         return "5mm"
 
+    def _planter_dripper_flows(self):
+        if self.PLANTER_DRIPPER_ID is None:
+            return self.DEFAULT_DRIPPER_FLOWS
+        catalog = get_catalog(self.db_path)
+        dripper = catalog.get_dripper(self.PLANTER_DRIPPER_ID)
+        if dripper is None:
+            raise ValueError(f"Dripper {self.PLANTER_DRIPPER_ID} not found in catalog")
+        # אינדקס 3 הוא physical_type
+        if dripper[3] != self.PLANTER_DRIPPER_TYPE:
+            raise ValueError(f"Dripper {self.PLANTER_DRIPPER_ID} ({dripper[1]}) cannot feed a planter")
+        flows = catalog.get_dripper_flows(dripper[0])
+        if len(flows) == 0:
+            raise ValueError(f"Dripper {self.PLANTER_DRIPPER_ID} has no flow rates")
+        return tuple(flows.tolist())
+
+    def _dripper_combo_table(self):
+        return get_combo_table(self._planter_dripper_flows(), self.MAX_EMITTERS_PER_PLANTER)
+
     def _calculate_dripper_combo(self, target_flow):
-        available_drippers = [8.0, 4.0, 2.0, 1.0]
-        
-        # טיפול במקרה קצה של זרימה נמוכה מאוד
-        if target_flow <= 1.0:
-            return "1x (1.0 L/h)", 1.0
-
-        best_combo = [1.0] # ערך התחלתי שרירותי
-        min_diff = abs(1.0 - target_flow)
-
-        # 1. בדיקת טפטפת בודדת
-        for d1 in available_drippers:
-            diff = abs(d1 - target_flow)
-            if diff < min_diff:
-                min_diff = diff
-                best_combo = [d1]
-
-        # 2. בדיקת שילוב של 2 טפטפות
-        for d1 in available_drippers:
-            for d2 in available_drippers:
-                total = d1 + d2
-                diff = abs(total - target_flow)
-                if diff < min_diff:
-                    min_diff = diff
-                    best_combo = [d1, d2]
-        
-        # 3. בדיקת שילוב של 3 טפטפות
-        for d1 in available_drippers:
-            for d2 in available_drippers:
-                for d3 in available_drippers:
-                    total = d1 + d2 + d3
-                    diff = abs(total - target_flow)
-                    if diff < min_diff:
-                        min_diff = diff
-                        best_combo = [d1, d2, d3]
-        
-        # יצירת הטקסט הסופי שיוצג למשתמש והחישוב של הזרימה בפועל
-        actual_flow = sum(best_combo)
-        combo_str = "+".join([str(d) for d in best_combo])
-        
-        return f"{len(best_combo)}x ({combo_str} L/h)", actual_flow
+        # הטבלה מחושבת פעם אחת לכל קטלוג - כאן רק חיפוש בינארי של השילוב הקרוב ביותר
+        return self._dripper_combo_table().combo_for(target_flow)
+
+    def _fitting_k_table(self):
+        """Returns (catalog, small_dia, large_dia, k_small, k_large, memo) of the catalog fittings"""
+        # k_small/k_large: ערכי K (ברך, T, מחבר ישר) בצינור הראשי הקטן והגדול ביותר (לפי קוטר פנימי);
+        # memo: ערכי K המאונטרפלים לכל קוטר פנימי שכבר חושב
+        catalog = get_catalog(self.db_path)
+        if self._fitting_k_model is None or self._fitting_k_model[0] is not catalog:
+            by_symbol = {}
+            for fitting in catalog.fittings:
+                by_symbol.setdefault(fitting[2], fitting)
+            defaults = {'elbows': self.K_ELBOW, 'tees': self.K_TEE, 'straights': self.K_CONNECTOR}
+            k_small, k_large = [], []
+            for kind, symbol in self.FITTING_SYMBOLS.items():
+                fitting = by_symbol.get(symbol)
+                k_small.append(fitting[3] if fitting else defaults[kind])
+                k_large.append(fitting[4] if fitting else defaults[kind])
+
+            candidates = self._main_pipe_candidates()
+            if candidates:
+                small_dia, large_dia = candidates[0][4], candidates[-1][4]
+            else:
+                small_dia = large_dia = 0.0
+            self._fitting_k_model = (catalog, small_dia, large_dia, np.array(k_small), np.array(k_large), {})
+        return self._fitting_k_model
+
+    def _fitting_k_values(self, internal_dia):
+        """K values (elbow, tee, straight connector) for a pipe of internal_dia (broadcasts)"""
+        # אינטרפולציה לינארית בין k_value_small ל-k_value_large, מוגבלת לתחום הצינורות הראשיים; קוטר בודד נשמר ב-memo
+        _, small_dia, large_dia, k_small, k_large, memo = self._fitting_k_table()
+        scalar = np.ndim(internal_dia) == 0
+        if scalar and internal_dia in memo:
+            return memo[internal_dia]
+
+        if large_dia > small_dia:
+            weight = np.clip((np.asarray(internal_dia, dtype=float) - small_dia) / (large_dia - small_dia), 0.0, 1.0)
+        else:
+            weight = np.zeros(np.shape(internal_dia))
+        k_values = k_small + weight[..., None] * (k_large - k_small)
+        if scalar:
+            memo[internal_dia] = k_values
+        return k_values
+
+    def _total_fitting_k(self, internal_dia, elbows=0, tees=0, straights=0):
+        """Total minor-loss coefficient of a connector mix on a pipe of internal_dia (broadcasts)"""
+        k_values = self._fitting_k_values(internal_dia)
+        return elbows * k_values[..., 0] + tees * k_values[..., 1] + straights * k_values[..., 2]
+
+    def _connectors_k(self, connectors, internal_dia, include_straights=True):
+        # בקו רציף (אדמה ישירה) מחברים ישרים אינם נספרים
+        return self._total_fitting_k(internal_dia, connectors.get('elbows', 0), connectors.get('tees', 0),
+                                     connectors.get('straights', 0) if include_straights else 0)
 
     def _calc_velocity(self, flow_lh, internal_diameter_mm):
         if flow_lh <= 0: return 0
@@ -131,11 +220,170 @@ class IrrigationCalculator:
         total_loss_bar = (friction_head_m + minor_head_m) / 10.197
         return total_loss_bar, velocity, f, re
 
-    def calculate_planters_scenario(self, length_m, num_planters, specific_flows_list, connectors):
-        nominal_dia, internal_dia = self._select_main_pipe_by_rules(length_m)
-        spaghetti_type = self._select_spaghetti_by_main(nominal_dia)
-        
-        planter_details_list = []
+    def _calc_segment_losses_vectorized(self, flows_lh, internal_diameter_mm, length_m, k_loss_per_segment=0):
+        """Array version of _calc_segment_loss - returns (loss, velocity, f, Re) arrays"""
+        flows = np.asarray(flows_lh, dtype=float)
+        active = flows > 0
+        # קוטר, אורך ומקדם K יכולים להיות סקלרים או מערכים (לכל תכנון בנפרד בחישוב אצווה)
+        d_m = np.asarray(internal_diameter_mm, dtype=float) / 1000.0
+        length_m = np.asarray(length_m, dtype=float)
+        area = math.pi * ((d_m / 2) ** 2)
+        g = 9.81
+
+        velocity = np.where(active, (flows / 3_600_000) / area, 0.0)
+        re = (velocity * d_m) / self.KINEMATIC_VISCOSITY
+        slow = velocity < 0.01
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = np.select(
+                [slow, re < 2000, re < 100000],
+                [0.03, 64 / re, 0.3164 / (re ** 0.25)],
+                default=0.02
+            )
+        re = np.where(slow, 0.0, re)
+
+        friction_head_m = f * (length_m / d_m) * (velocity ** 2) / (2 * g)
+        minor_head_m = k_loss_per_segment * (velocity ** 2) / (2 * g)
+        total_loss_bar = (friction_head_m + minor_head_m) / 10.197
+
+        # מקטע ללא זרימה מחזיר אפסים, בדיוק כמו הגרסה הסקלרית
+        return (np.where(active, total_loss_bar, 0.0),
+                velocity,
+                np.where(active, f, 0.0),
+                np.where(active, re, 0.0))
+
+    def _march_lateral(self, segment_flows, internal_dia, segment_len, k_per_segment):
+        """Returns (cumulative loss list starting at 0, debug info of the first segment) of a lateral"""
+        # segment_len ו-k_per_segment יכולים להיות סקלרים או מערך לכל מקטע
+        if len(segment_flows) == 0:
+            return [0], {}
+
+        if self.engine == ENGINE_REFERENCE:
+            lengths = np.broadcast_to(segment_len, (len(segment_flows),))
+            k_values = np.broadcast_to(k_per_segment, (len(segment_flows),))
+            cumulative_loss = 0
+            graph_loss = [0]
+            first = None
+            for i, flow in enumerate(segment_flows):
+                loss, v, f, re = self._calc_segment_loss(flow, internal_dia, lengths[i], k_values[i])
+                if first is None:
+                    first = (flow, loss, v, f, re)
+                cumulative_loss += loss
+                graph_loss.append(cumulative_loss)
+        else:
+            flows = np.asarray(segment_flows, dtype=float)
+            losses, velocity, f_arr, re_arr = self._calc_segment_losses_vectorized(
+                flows, internal_dia, segment_len, k_per_segment)
+            graph_loss = np.concatenate(([0.0], np.cumsum(losses))).tolist()
+            first = (float(flows[0]), float(losses[0]), float(velocity[0]), float(f_arr[0]), float(re_arr[0]))
+
+        flow, loss, v, f, re = first
+        debug_info = {
+            "velocity": v,
+            "reynolds": re,
+            "friction_f": f,
+            "segment_flow": flow,
+            "segment_loss": loss,
+            "internal_dia": internal_dia
+        }
+        return graph_loss, debug_info
+
+    def _planters_segment_flows(self, total_flow, actual_flows_list):
+        """Flow in each segment between planters - every planter takes its flow out of the line"""
+        outflows = np.asarray(actual_flows_list, dtype=float)
+        upstream_taken = np.concatenate(([0.0], np.cumsum(outflows[:-1])))
+        return np.maximum(total_flow - upstream_taken, 0.0)
+
+    def _continuous_segment_flows(self, total_flow_lh, segments):
+        """Flow in each segment of a uniformly discharging lateral"""
+        flow_drop_per_segment = total_flow_lh / segments
+        return np.maximum(total_flow_lh - flow_drop_per_segment * np.arange(segments), 0.0)
+
+    def _adaptive_continuous_segments(self, length_m, total_flow_lh, internal_dia, total_k, tolerance_bar):
+        """Adaptive split of a uniformly discharging lateral; returns the sorted segment starts and lengths"""
+        # מקטע מפוצל רק אם ההפסד שלו משתנה בחציה ביותר מחלקו ב-tolerance_bar;
+        # כל מקטע נושא את הספיקה באמצעו (דיוק מסדר שני)
+        def interval_loss(starts, lengths):
+            flows = total_flow_lh * (1 - (starts + lengths / 2) / length_m)
+            loss, _, _, _ = self._calc_segment_losses_vectorized(
+                flows, internal_dia, lengths, total_k * lengths / length_m)
+            return loss
+
+        edges = np.linspace(0, length_m, self.ADAPTIVE_MIN_SEGMENTS + 1)
+        starts, lengths = edges[:-1], np.diff(edges)
+        accepted_starts, accepted_lengths = [], []
+        accepted_count = 0
+
+        # כל מעבר בודק את כל המקטעים הפתוחים יחד: מקטע שלם מול שני חצאיו
+        while len(starts):
+            halves = lengths / 2
+            whole = interval_loss(starts, lengths)
+            split = interval_loss(starts, halves) + interval_loss(starts + halves, halves)
+            ok = np.abs(whole - split) <= tolerance_bar * lengths / length_m
+
+            # הגעה לתקרת המקטעים - מקבלים את כל המקטעים הנותרים כפי שהם
+            if accepted_count + len(starts) + np.count_nonzero(~ok) > self.ADAPTIVE_MAX_SEGMENTS:
+                ok[:] = True
+
+            accepted_starts.append(starts[ok])
+            accepted_lengths.append(lengths[ok])
+            accepted_count += np.count_nonzero(ok)
+            refine_starts, refine_halves = starts[~ok], halves[~ok]
+            starts = np.concatenate((refine_starts, refine_starts + refine_halves))
+            lengths = np.concatenate((refine_halves, refine_halves))
+
+        starts = np.concatenate(accepted_starts)
+        lengths = np.concatenate(accepted_lengths)
+        order = np.argsort(starts)
+        return starts[order], lengths[order]
+
+    def _closed_form_continuous_losses(self, length_m, total_flow_lh, internal_dia, total_k, fractions):
+        """Cumulative loss (bar) from the inlet to each fraction of the length of a uniformly discharging lateral (broadcasts)"""
+        # הספיקה יורדת לינארית, ולכן בכל משטר חיכוך מפל הגובה הוא c * s^m, כש-s הוא חלק הספיקה
+        # שנשאר בצינור (m=1 למינרי, 1.75 בלזיוס, 2 ל-f קבוע). כל משטר מתאנטגרל בנוסחה סגורה
+        # (במשטר יחיד זה מקדם כריסטיאנסן 1/(m+1)), כך שמעבר בין משטרים לא דורש חלוקה למקטעים
+        g = 9.81
+        length_m = np.asarray(length_m, dtype=float)
+        d_m = np.asarray(internal_dia, dtype=float) / 1000.0
+        area = math.pi * ((d_m / 2) ** 2)
+
+        v0 = (np.asarray(total_flow_lh, dtype=float) / 3_600_000) / area
+        re0 = (v0 * d_m) / self.KINEMATIC_VISCOSITY
+        velocity_head = (v0 ** 2) / (2 * g)
+        flowing = v0 > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # גבולות המשטרים, כשיעור מהספיקה בכניסה (s), לפי סדר הבדיקה ב-_calc_friction_factor
+            s_slow = np.where(flowing, 0.01 / v0, np.inf)
+            s_laminar = np.maximum(s_slow, np.where(flowing, 2000 / re0, np.inf))
+            s_blasius = np.maximum(s_laminar, np.where(flowing, 100000 / re0, np.inf))
+
+            regimes = [
+                (0.0, s_slow, 0.03 / d_m * velocity_head, 2.0),
+                (s_slow, s_laminar, 64 * self.KINEMATIC_VISCOSITY * v0 / (2 * g * d_m ** 2), 1.0),
+                (s_laminar, s_blasius, 0.3164 * re0 ** -0.25 / d_m * velocity_head, 1.75),
+                (s_blasius, np.inf, 0.02 / d_m * velocity_head, 2.0),
+            ]
+
+            s_end = 1.0 - np.asarray(fractions, dtype=float)
+            friction_head_m = 0.0
+            for lower, upper, coeff, m in regimes:
+                inlet_part = np.clip(1.0, lower, upper) ** (m + 1)
+                point_part = np.clip(s_end, lower, upper) ** (m + 1)
+                friction_head_m = friction_head_m + np.where(
+                    flowing, length_m * coeff * (inlet_part - point_part) / (m + 1), 0.0)
+
+        # מקדם האביזרים מפוזר באורך הקו ומתאנטגרל באותה דרך (m=2)
+        minor_head_m = total_k * velocity_head * (1.0 - s_end ** 3) / 3
+        return (friction_head_m + minor_head_m) / 10.197
+
+    def calculate_planters_scenario(self, length_m, num_planters, specific_flows_list, connectors,
+                                    supply_pressure_bar=None):
+        """
+        If supply_pressure_bar is given, the main pipe is chosen by optimize_main_pipe
+        (smallest catalog pipe meeting MIN_END_PRESSURE) instead of the length rules.
+        """
+        combos = []
         actual_flows_list = []
         
         if not specific_flows_list:
@@ -144,45 +392,31 @@ class IrrigationCalculator:
         for i in range(num_planters):
             target = specific_flows_list[i] if i < len(specific_flows_list) else 2.0
             desc, actual = self._calculate_dripper_combo(target)
-            planter_details_list.append(f"Planter {i+1} (Req: {target}L): {spaghetti_type} -> {desc} = {actual}L/h")
+            combos.append((target, desc, actual))
             actual_flows_list.append(actual)
             
         total_flow = sum(actual_flows_list)
+
+        if supply_pressure_bar is None:
+            nominal_dia, internal_dia = self._select_main_pipe_by_rules(length_m)
+        else:
+            nominal_dia, internal_dia = self._select_main_pipe_by_optimizer(
+                length_m, supply_pressure_bar, connectors, outlet_flows_lh=actual_flows_list)
+        spaghetti_type = self._select_spaghetti_by_main(nominal_dia)
+
+        planter_details_list = []
+        for i, (target, desc, actual) in enumerate(combos):
+            planter_details_list.append(f"Planter {i+1} (Req: {target}L): {spaghetti_type} -> {desc} = {actual}L/h")
         
-        total_k = (connectors.get('elbows', 0) * self.K_ELBOW) + \
-                  (connectors.get('tees', 0) * self.K_TEE) + \
-                  (connectors.get('straights', 0) * self.K_CONNECTOR)
+        total_k = self._connectors_k(connectors, internal_dia)
         
         k_per_segment = total_k / num_planters if num_planters > 0 else 0
         dist_between = length_m / num_planters
         
-        current_flow = total_flow
-        cumulative_loss = 0
-        
-        graph_x = [0]
-        graph_loss = [0]
-        debug_info = {}
-        
-        for i in range(num_planters):
-            loss, v, f, re = self._calc_segment_loss(current_flow, internal_dia, dist_between, k_per_segment)
-            
-            if i == 0:
-                debug_info = {
-                    "velocity": v,
-                    "reynolds": re,
-                    "friction_f": f,
-                    "segment_flow": current_flow,
-                    "segment_loss": loss,
-                    "internal_dia": internal_dia
-                }
-
-            cumulative_loss += loss
-            graph_x.append((i + 1) * dist_between)
-            graph_loss.append(cumulative_loss)
-            
-            flow_out = actual_flows_list[i] if i < len(actual_flows_list) else 0
-            current_flow -= flow_out
-            if current_flow < 0: current_flow = 0
+        segment_flows = self._planters_segment_flows(total_flow, actual_flows_list)
+        graph_loss, debug_info = self._march_lateral(segment_flows, internal_dia, dist_between, k_per_segment)
+        cumulative_loss = graph_loss[-1]
+        graph_x = [i * dist_between for i in range(num_planters + 1)]
             
         required_inlet = (self.MIN_END_PRESSURE + cumulative_loss) * self.SAFETY_MARGIN
         
@@ -202,45 +436,39 @@ class IrrigationCalculator:
             "debug_info": debug_info
         }
 
-    def calculate_continuous_soil(self, length_m, total_flow_lh, connectors):
-        nominal_dia, internal_dia = self._select_main_pipe_by_rules(length_m)
-        
-        segments = 50 
-        segment_len = length_m / segments
-        flow_drop_per_segment = total_flow_lh / segments
-        
-        total_k = (connectors.get('elbows', 0) * self.K_ELBOW) + \
-                  (connectors.get('tees', 0) * self.K_TEE) 
-        k_per_segment = total_k / segments
-
-        current_flow = total_flow_lh
-        cumulative_loss = 0
-        graph_x = [0]
-        graph_loss = [0]
-        
-        debug_info = {}
+    def calculate_continuous_soil(self, length_m, total_flow_lh, connectors,
+                                  segmentation=SEGMENTATION_AUTO, tolerance_bar=0.001,
+                                  supply_pressure_bar=None):
+        """segmentation: "fixed" (50 segments), "adaptive" (to tolerance_bar), "closed_form" or "auto" (closed form)"""
+        # קו רציף תמיד מפריק באופן אחיד - הנוסחה הסגורה מדויקת עבורו
+        if segmentation == SEGMENTATION_AUTO:
+            segmentation = SEGMENTATION_CLOSED_FORM
+        if segmentation not in (SEGMENTATION_FIXED, SEGMENTATION_ADAPTIVE, SEGMENTATION_CLOSED_FORM):
+            raise ValueError(f"Unknown segmentation mode: {segmentation}")
 
-        for i in range(segments):
-            loss, v, f, re = self._calc_segment_loss(current_flow, internal_dia, segment_len, k_per_segment)
-            
-            if i == 0:
-                 debug_info = {
-                    "velocity": v,
-                    "reynolds": re,
-                    "friction_f": f,
-                    "segment_flow": current_flow,
-                    "segment_loss": loss,
-                    "internal_dia": internal_dia
-                }
-            
-            cumulative_loss += loss
-            current_flow -= flow_drop_per_segment
-            if current_flow < 0: current_flow = 0
-            
-            graph_x.append((i + 1) * segment_len)
-            graph_loss.append(cumulative_loss)
+        if supply_pressure_bar is None:
+            nominal_dia, internal_dia = self._select_main_pipe_by_rules(length_m)
+        else:
+            # עם לחץ אספקה הצינור נבחר באופטימיזציה, לפי אותו מודל הפסדים שמדווח בתוצאה.
+            # החלוקה האדפטיבית מתכנסת לאינטגרל המדויק - הנוסחה הסגורה היא המודל הקרוב אליה
+            model = SEGMENTATION_FIXED if segmentation == SEGMENTATION_FIXED else SEGMENTATION_CLOSED_FORM
+            nominal_dia, internal_dia = self._select_main_pipe_by_optimizer(
+                length_m, supply_pressure_bar, connectors, total_flow_lh=total_flow_lh, segmentation=model)
+
+        while True:
+            total_k = self._connectors_k(connectors, internal_dia, include_straights=False)
+            graph_x, graph_loss, debug_info, segments = self._continuous_profile(
+                length_m, total_flow_lh, internal_dia, total_k, segmentation, tolerance_bar)
+            required_inlet = (self.MIN_END_PRESSURE + graph_loss[-1]) * self.SAFETY_MARGIN
+
+            # הפרש שנותר בין מודל הבחירה לחישוב (רק בחלוקה האדפטיבית) - עולים לצינור הבא
+            if supply_pressure_bar is None or required_inlet <= supply_pressure_bar:
+                break
+            larger = [p for p in self._main_pipe_candidates() if p[4] > internal_dia]
+            if not larger:
+                break
+            nominal_dia, internal_dia = larger[0][2], larger[0][4]
 
-        required_inlet = (self.MIN_END_PRESSURE + cumulative_loss) * self.SAFETY_MARGIN
         graph_y = [round(required_inlet - l, 3) for l in graph_loss]
 
         return {
@@ -249,6 +477,456 @@ class IrrigationCalculator:
             "recommended_pipe_mm": nominal_dia,
             "total_flow_lh": round(total_flow_lh, 2),
             "required_inlet_pressure_bar": round(required_inlet, 3),
+            "segments_used": segments,
             "graph_data": {"x": graph_x, "y": graph_y},
             "debug_info": debug_info
-        }
\ No newline at end of file
+        }
+
+    def _continuous_profile(self, length_m, total_flow_lh, internal_dia, total_k, segmentation, tolerance_bar):
+        """Returns (graph_x, cumulative loss list, debug info, segments used) of a continuous lateral"""
+        if segmentation == SEGMENTATION_ADAPTIVE:
+            starts, segment_len = self._adaptive_continuous_segments(
+                length_m, total_flow_lh, internal_dia, total_k, tolerance_bar)
+            segments = len(starts)
+            # מקדם ההתנגדות המקומי מתחלק לפי אורך המקטע
+            k_per_segment = total_k * segment_len / length_m
+            segment_flows = total_flow_lh * (1 - (starts + segment_len / 2) / length_m)
+            graph_x = np.append(starts, length_m).tolist()
+        else:
+            segments = self.FIXED_SEGMENTS
+            segment_len = length_m / segments
+            k_per_segment = total_k / segments
+            segment_flows = self._continuous_segment_flows(total_flow_lh, segments)
+            graph_x = [i * segment_len for i in range(segments + 1)]
+
+        if segmentation == SEGMENTATION_CLOSED_FORM:
+            # חישוב אנליטי בלי מקטעים (segments_used = 0); הפרופיל נדגם ב-FIXED_SEGMENTS צעדים לגרף
+            graph_loss = self._closed_form_continuous_losses(
+                length_m, total_flow_lh, internal_dia, total_k, np.linspace(0, 1, segments + 1)).tolist()
+            # נתוני הכניסה לקו (ללא מעבר על המקטעים)
+            _, v, f, re = self._calc_segment_loss(total_flow_lh, internal_dia, segment_len, k_per_segment)
+            debug_info = {
+                "velocity": v,
+                "reynolds": re,
+                "friction_f": f,
+                "segment_flow": total_flow_lh,
+                "segment_loss": graph_loss[1],
+                "internal_dia": internal_dia
+            }
+            return graph_x, graph_loss, debug_info, 0
+
+        graph_loss, debug_info = self._march_lateral(segment_flows, internal_dia, segment_len, k_per_segment)
+        return graph_x, graph_loss, debug_info, segments
+
+    def _main_pipe_candidates(self):
+        """Catalog pipes usable as a main line, sorted by internal diameter"""
+        pipes = [p for p in get_catalog(self.db_path).pipes if p[2] >= self.MIN_MAIN_PIPE_MM]
+        return sorted(pipes, key=lambda p: (p[4], p[2]))
+
+    def _section_loss_evaluator(self, length_m, connectors, total_flow_lh=None, outlet_flows_lh=None,
+                                segmentation=SEGMENTATION_CLOSED_FORM):
+        """Returns (number of sections, function of the sections' internal diameters -> total loss in bar)"""
+        # קו עציצים: קטע לכל עציץ. קו רציף: הנוסחה הסגורה לכל קטע, או ב-"fixed" אותה חלוקה
+        # ל-FIXED_SEGMENTS מקטעים כמו ב-calculate_continuous_soil (קטע לכל מקטע)
+        if outlet_flows_lh is not None:
+            outlet_flows = np.asarray(outlet_flows_lh, dtype=float)
+            sections = len(outlet_flows)
+            segment_flows = self._planters_segment_flows(outlet_flows.sum(), outlet_flows)
+
+            def section_loss(internal_dias):
+                # K של האביזרים תלוי בקוטר, ולכן מחושב לכל קטע לפי הקוטר שלו
+                total_k = self._connectors_k(connectors, internal_dias)
+                losses, _, _, _ = self._calc_segment_losses_vectorized(
+                    segment_flows, internal_dias, length_m / sections, total_k / sections)
+                return float(losses.sum())
+        elif segmentation == SEGMENTATION_FIXED:
+            sections = self.FIXED_SEGMENTS
+            segment_flows = self._continuous_segment_flows(total_flow_lh, sections)
+
+            def section_loss(internal_dias):
+                total_k = self._connectors_k(connectors, internal_dias, include_straights=False)
+                losses, _, _, _ = self._calc_segment_losses_vectorized(
+                    segment_flows, internal_dias, length_m / sections, total_k / sections)
+                return float(losses.sum())
+        else:
+            sections = self.TELESCOPE_SECTIONS
+            edges = np.linspace(0, 1, sections + 1)
+
+            def section_loss(internal_dias):
+                total_k = self._connectors_k(connectors, internal_dias, include_straights=False)
+                to_end = self._closed_form_continuous_losses(length_m, total_flow_lh, internal_dias, total_k, edges[1:])
+                to_start = self._closed_form_continuous_losses(length_m, total_flow_lh, internal_dias, total_k, edges[:-1])
+                return float((to_end - to_start).sum())
+
+        return sections, section_loss
+
+    def optimize_main_pipe(self, length_m, supply_pressure_bar, connectors, total_flow_lh=None,
+                           outlet_flows_lh=None, price_per_m=None, telescoping=False,
+                           segmentation=SEGMENTATION_CLOSED_FORM):
+        """
+        Smallest (or, with price_per_m by nominal diameter, cheapest) catalog main pipe whose inlet
+        pressure fits supply_pressure_bar; recommended_pipe_mm is the inlet pipe, "sections" the mix.
+        """
+        candidates = self._main_pipe_candidates()
+        if not candidates:
+            raise ValueError("No main pipes in catalog")
+        sections, section_loss = self._section_loss_evaluator(
+            length_m, connectors, total_flow_lh=total_flow_lh, outlet_flows_lh=outlet_flows_lh,
+            segmentation=segmentation)
+        max_loss = supply_pressure_bar / self.SAFETY_MARGIN - self.MIN_END_PRESSURE
+        internal = np.array([p[4] for p in candidates], dtype=float)
+        evaluations = 0
+
+        def fits(section_indices):
+            nonlocal evaluations
+            evaluations += 1
+            return section_loss(internal[section_indices]) <= max_loss
+
+        def uniform(index):
+            return np.full(sections, index)
+
+        result = {
+            "type": "pipe_optimization",
+            "feasible": False,
+            "candidates": len(candidates),
+        }
+
+        # ההפסד יורד עם הקוטר - חיפוש בינארי על המועמדים הממוינים, וכל צינור גדול יותר עומד בלחץ בלי לבדוק
+        low, high = 0, len(candidates) - 1
+        if not fits(uniform(high)):
+            result["evaluations"] = evaluations
+            return result
+        while low < high:
+            mid = (low + high) // 2
+            if fits(uniform(mid)):
+                high = mid
+            else:
+                low = mid + 1
+
+        chosen = low
+        if price_per_m:
+            priced = [i for i in range(low, len(candidates)) if candidates[i][2] in price_per_m]
+            if priced:
+                chosen = min(priced, key=lambda i: price_per_m[candidates[i][2]])
+
+        assignment = uniform(chosen)
+        if telescoping:
+            # מקטינים את הקוטר בקצה הקו (שם הספיקה הנמוכה ביותר), קוטר אחר קוטר;
+            # אורך כל מדרגה נמצא שוב בחיפוש בינארי
+            tail_limit = sections
+            for smaller in range(chosen - 1, -1, -1):
+                # צינור ללא מחיר לא נכנס לתכנון מתומחר - אחרת היה נספר כחינם
+                if price_per_m and candidates[smaller][2] not in price_per_m:
+                    continue
+                low_t, high_t = 0, tail_limit
+                while low_t < high_t:
+                    mid_t = (low_t + high_t + 1) // 2
+                    trial = assignment.copy()
+                    trial[sections - mid_t:] = smaller
+                    if fits(trial):
+                        low_t = mid_t
+                    else:
+                        high_t = mid_t - 1
+                if low_t == 0:
+                    break
+                assignment[sections - low_t:] = smaller
+                tail_limit = low_t
+
+        section_len = length_m / sections
+        telescope = []
+        for index in assignment:
+            if telescope and telescope[-1]["nominal_mm"] == candidates[index][2]:
+                telescope[-1]["length_m"] += section_len
+            else:
+                telescope.append({"nominal_mm": candidates[index][2],
+                                  "internal_mm": candidates[index][4],
+                                  "length_m": section_len})
+
+        pipe_lengths = {}
+        for sec in telescope:
+            sec["length_m"] = round(sec["length_m"], 3)
+            pipe_lengths[sec["nominal_mm"]] = round(pipe_lengths.get(sec["nominal_mm"], 0.0) + sec["length_m"], 3)
+
+        loss = section_loss(internal[assignment])
+        result.update({
+            "feasible": True,
+            "recommended_pipe_mm": candidates[chosen][2],
+            "internal_dia_mm": candidates[chosen][4],
+            "required_inlet_pressure_bar": round((self.MIN_END_PRESSURE + loss) * self.SAFETY_MARGIN, 3),
+            "sections": telescope,
+            "pipe_lengths_m": pipe_lengths,
+            "evaluations": evaluations,
+        })
+        if price_per_m:
+            # קטע ללא מחיר - אין עלות חומר ידועה
+            if all(mm in price_per_m for mm in pipe_lengths):
+                result["material_cost"] = sum(price_per_m[mm] * length for mm, length in pipe_lengths.items())
+            else:
+                result["material_cost"] = None
+        return result
+
+    def _select_main_pipe_by_optimizer(self, length_m, supply_pressure_bar, connectors,
+                                       total_flow_lh=None, outlet_flows_lh=None,
+                                       segmentation=SEGMENTATION_CLOSED_FORM):
+        opt = self.optimize_main_pipe(length_m, supply_pressure_bar, connectors, total_flow_lh=total_flow_lh,
+                                      outlet_flows_lh=outlet_flows_lh, segmentation=segmentation)
+        if opt["feasible"]:
+            return opt["recommended_pipe_mm"], opt["internal_dia_mm"]
+        # אף צינור לא עומד בלחץ הזמין - הצינור הגדול ביותר הוא הקרוב ביותר לדרישה
+        largest = self._main_pipe_candidates()[-1]
+        return largest[2], largest[4]
+
+    def _emitter_flows_at_pressure(self, k_coeff, exponent_x, min_pressure_bar, pressures_bar):
+        """Emitter flows (L/h) at the given pressures: q = k * P^x, like an orifice below min_pressure_bar"""
+        # מתחת ללחץ המינימלי הטפטפת מפסיקה לווסת ומתנהגת כמו חור (q ~ P^0.5); בלי לחץ היא נעצרת
+        pressures = np.maximum(np.asarray(pressures_bar, dtype=float), 0.0)
+        if min_pressure_bar <= 0:
+            # אין לחץ מינימלי - החוק k * P^x חל עד שהלחץ נגמר
+            return np.where(pressures > 0, k_coeff * pressures ** exponent_x, 0.0)
+        regulated = k_coeff * np.maximum(pressures, min_pressure_bar) ** exponent_x
+        orifice = k_coeff * (min_pressure_bar ** exponent_x) * np.sqrt(pressures / min_pressure_bar)
+        return np.where(pressures >= min_pressure_bar, regulated, orifice)
+
+    def _emitter_flow_slopes(self, k_coeff, exponent_x, min_pressure_bar, pressures_bar):
+        """dq/dP (L/h per bar) of _emitter_flows_at_pressure; 0 without pressure"""
+        pressures = np.asarray(pressures_bar, dtype=float)
+        if min_pressure_bar <= 0:
+            # השיפוע של P^x (x < 1) אינסופי ב-P=0 - מחושב לכל היותר בלחץ קטן מאוד
+            floor = np.maximum(pressures, 1e-4)
+            return np.where(pressures > 0, k_coeff * exponent_x * floor ** (exponent_x - 1), 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            regulated = k_coeff * exponent_x * np.maximum(pressures, min_pressure_bar) ** (exponent_x - 1)
+            # השיפוע אינסופי ב-P=0; מחושב לכל היותר בלחץ קטן מאוד כדי שצעד ניוטון יישאר סופי
+            floor = np.maximum(pressures, 1e-4 * min_pressure_bar)
+            orifice = k_coeff * (min_pressure_bar ** exponent_x) * 0.5 / np.sqrt(floor * min_pressure_bar)
+        return np.where(pressures >= min_pressure_bar, regulated, np.where(pressures > 0, orifice, 0.0))
+
+    @staticmethod
+    def _lateral_newton_step(flow_slopes, loss_slopes, rhs):
+        """Newton step (change of every emitter flow) of the lateral, solved in O(n)"""
+        # המערכת: x_i + d_i * u_i = r_i, כאשר u_i = sum_{j<=i} l'_j * Y_j הוא שינוי מפל הלחץ עד טפטפת i
+        # ו-Y_j = sum_{k>=j} x_k שינוי הספיקה במקטע j (d = dq/dP, l' = dloss/dQ). היעקוביאן מלא אבל
+        # במבנה של סכומים מקוננים: מעבר אחורה (Y_i = alpha_i * u_(i-1) + beta_i) ומעבר קדימה פותרים אותו.
+        # כל מכנה >= 1, ולכן המעברים יציבים
+        d, lp, r = flow_slopes.tolist(), loss_slopes.tolist(), rhs.tolist()
+        n = len(r)
+        alpha, beta = [0.0] * (n + 1), [0.0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            a = alpha[i + 1] - d[i]
+            b = beta[i + 1] + r[i]
+            denominator = 1.0 - lp[i] * a
+            alpha[i], beta[i] = a / denominator, b / denominator
+
+        segment_change = [0.0] * (n + 1)
+        u = 0.0
+        for i in range(n):
+            segment_change[i] = alpha[i] * u + beta[i]
+            u += lp[i] * segment_change[i]
+        segment_change = np.array(segment_change)
+        return segment_change[:-1] - segment_change[1:]
+
+    def solve_emitter_flows(self, length_m, nominal_flows_lh, connectors, inlet_pressure_bar=None,
+                            dripper_id=None, relaxation=1.0):
+        """
+        Flow of every emitter (nominal flows at EMITTER_NOMINAL_PRESSURE) at its local pressure along an
+        evenly spaced lateral; inlet_pressure_bar defaults to the required inlet of the nominal design.
+        """
+        catalog = get_catalog(self.db_path)
+        dripper = catalog.get_dripper(dripper_id)
+        if dripper is None:
+            raise ValueError(f"Dripper {dripper_id} not found in catalog")
+        exponent_x, min_pressure, max_pressure = dripper[4], dripper[5], dripper[6]
+
+        nominal_flows = np.asarray(nominal_flows_lh, dtype=float)
+        num_emitters = len(nominal_flows)
+        if num_emitters == 0:
+            raise ValueError("At least one emitter is required")
+
+        nominal_dia, internal_dia = self._select_main_pipe_by_rules(length_m)
+        total_k = self._connectors_k(connectors, internal_dia)
+        k_per_segment = total_k / num_emitters
+        dist_between = length_m / num_emitters
+
+        def segment_losses(segment_flows):
+            losses, _, _, _ = self._calc_segment_losses_vectorized(
+                segment_flows, internal_dia, dist_between, k_per_segment)
+            return losses
+
+        def outlet_pressures(flows, inlet):
+            return inlet - np.cumsum(segment_losses(self._planters_segment_flows(flows.sum(), flows)))
+
+        if inlet_pressure_bar is None:
+            nominal_loss = self.MIN_END_PRESSURE - outlet_pressures(nominal_flows, self.MIN_END_PRESSURE)[-1]
+            inlet_pressure_bar = (self.MIN_END_PRESSURE + nominal_loss) * self.SAFETY_MARGIN
+
+        k_coeff = nominal_flows / (self.EMITTER_NOMINAL_PRESSURE ** exponent_x)
+
+        def flow_residual(flows):
+            pressures = outlet_pressures(flows, inlet_pressure_bar)
+            return self._emitter_flows_at_pressure(k_coeff, exponent_x, min_pressure, pressures) - flows, pressures
+
+        # שיטת ניוטון על q - q(P(q)) = 0 עד שהשארית הגדולה ביותר קטנה מ-EMITTER_TOLERANCE_LH
+        flows = nominal_flows.copy()
+        step_residual, pressures = flow_residual(flows)
+        residual = float(np.max(np.abs(step_residual)))
+        damping = relaxation
+        iterations = 0
+        stalled = False
+        while iterations < self.EMITTER_MAX_ITERATIONS and residual > self.EMITTER_TOLERANCE_LH:
+            # שיפועי ההפסד לפי ספיקת המקטע (הפרש סופי) ושיפועי הטפטפות לפי הלחץ
+            segment_flows = self._planters_segment_flows(flows.sum(), flows)
+            delta = np.maximum(segment_flows, 1e-3) * 1e-6
+            loss_slopes = (segment_losses(segment_flows + delta) - segment_losses(segment_flows)) / delta
+            flow_slopes = self._emitter_flow_slopes(k_coeff, exponent_x, min_pressure, pressures)
+            newton = self._lateral_newton_step(flow_slopes, loss_slopes, step_residual)
+
+            # ריסון: חוצים את הצעד עד שהשארית קטנה, וכל צעד מתחיל שוב מ-relaxation
+            damping = relaxation
+            while damping >= self.EMITTER_MIN_DAMPING:
+                trial = np.maximum(flows + damping * newton, 0.0)
+                trial_residual, trial_pressures = flow_residual(trial)
+                if np.dot(trial_residual, trial_residual) < np.dot(step_residual, step_residual):
+                    break
+                damping /= 2
+            else:
+                # שום ריסון לא משפר - בדרך כלל קצה מורעב שבו מקדם החיכוך קופץ (זרימה איטית), ולכן
+                # אין שורש מדויק. עוצרים עם הפתרון הטוב ביותר במקום לרוץ עד EMITTER_MAX_ITERATIONS
+                stalled = True
+                break
+            flows, step_residual, pressures = trial, trial_residual, trial_pressures
+            residual = float(np.max(np.abs(step_residual)))
+            iterations += 1
+
+        pressures = outlet_pressures(flows, inlet_pressure_bar)
+        out_of_range = np.count_nonzero((pressures < min_pressure) | (pressures > max_pressure))
+        # ספיקות נומינליות שהדגם לא מציע בקטלוג
+        not_in_catalog = np.count_nonzero(~np.isin(nominal_flows, catalog.get_dripper_flows(dripper[0])))
+
+        return {
+            "type": "emitter_solution",
+            "recommended_main_pipe_mm": nominal_dia,
+            "dripper_type": dripper[1],
+            "inlet_pressure_bar": round(inlet_pressure_bar, 3),
+            "emitter_flows_lh": flows.tolist(),
+            "emitter_pressures_bar": pressures.tolist(),
+            "total_flow_lh": round(float(flows.sum()), 2),
+            "end_flow_lh": float(flows[-1]),
+            "emitters_out_of_range": int(out_of_range),
+            "emitters_not_in_catalog": int(not_in_catalog),
+            "convergence": {
+                "converged": residual <= self.EMITTER_TOLERANCE_LH,
+                "iterations": iterations,
+                "residual_lh": residual,
+                "final_relaxation": damping,
+                "stalled": stalled
+            }
+        }
+
+    def _select_main_pipes_by_rules_batch(self, lengths_m):
+        """Columnar version of _select_main_pipe_by_rules - returns (nominal, internal) arrays"""
+        lengths_m = np.asarray(lengths_m, dtype=float)
+        by_rules = np.select([lengths_m <= 60, lengths_m <= 100], [16, 25], default=32)
+        nominal = np.empty(len(by_rules), dtype=float)
+        internal = np.empty(len(by_rules), dtype=float)
+        # שליפה אחת מהקטלוג לכל קוטר שונה, ולא לכל תכנון
+        for dia in np.unique(by_rules):
+            nominal[by_rules == dia], internal[by_rules == dia] = self._catalog_pipe_for_nominal(int(dia))
+        return nominal, internal
+
+    def calculate_batch(self, lengths_m, flows_lh, elbows=0, tees=0, straights=0,
+                        num_outlets=None, return_profiles=False, segmentation=SEGMENTATION_AUTO):
+        """
+        Evaluates many designs in one call (columnar inputs, dict of NumPy columns out): continuous-soil
+        laterals with total flow flows_lh, or planters lines with num_outlets outlets of flows_lh each.
+        """
+        lengths_m = np.atleast_1d(np.asarray(lengths_m, dtype=float))
+        n_designs = len(lengths_m)
+        flows_lh = np.broadcast_to(np.asarray(flows_lh, dtype=float), (n_designs,))
+        elbows = np.broadcast_to(np.asarray(elbows, dtype=float), (n_designs,))
+        tees = np.broadcast_to(np.asarray(tees, dtype=float), (n_designs,))
+        straights = np.broadcast_to(np.asarray(straights, dtype=float), (n_designs,))
+
+        nominal, internal = self._select_main_pipes_by_rules_batch(lengths_m)
+
+        # "auto": נוסחה סגורה לקו רציף וחלוקה קבועה לקו עציצים
+        if segmentation == SEGMENTATION_AUTO:
+            segmentation = SEGMENTATION_CLOSED_FORM if num_outlets is None else SEGMENTATION_FIXED
+        if segmentation not in (SEGMENTATION_FIXED, SEGMENTATION_CLOSED_FORM):
+            raise ValueError(f"Unsupported batch segmentation mode: {segmentation}")
+        closed_form = segmentation == SEGMENTATION_CLOSED_FORM
+        if closed_form and num_outlets is not None:
+            raise ValueError("The closed-form evaluator only applies to continuous-soil designs")
+
+        if num_outlets is None:
+            segments = np.full(n_designs, self.FIXED_SEGMENTS)
+            total_flow = flows_lh.copy()
+            total_k = self._total_fitting_k(internal, elbows, tees)
+        else:
+            segments = np.broadcast_to(np.asarray(num_outlets, dtype=int), (n_designs,))
+            if n_designs and segments.min() < 1:
+                raise ValueError("Every planters design needs at least one outlet")
+            actual_per_outlet = self._dripper_combo_table().lookup_flows(flows_lh)
+            total_flow = actual_per_outlet * segments
+            total_k = self._total_fitting_k(internal, elbows, tees, straights)
+
+        required_inlet = np.empty(n_designs, dtype=float)
+        max_segments = int(segments.max()) if n_designs else 0
+        # פרופילים: שורה לכל תכנון, מרופדת ב-NaN עד מספר המקטעים הגדול ביותר
+        if return_profiles:
+            profile_x = np.full((n_designs, max_segments + 1), np.nan)
+            profile_pressure = np.full((n_designs, max_segments + 1), np.nan)
+
+        # עיבוד במנות כדי להגביל את גודל המטריצות בזיכרון: התכנונים ממוינים לפי מספר המקטעים,
+        # כל מנה מרופדת רק עד המקסימום שלה, ומספר השורות במנה נקבע לפי מספר התאים
+        order = np.argsort(segments, kind='stable')
+        start = 0
+        while start < n_designs:
+            end = n_designs
+            while True:
+                chunk_rows = max(1, self.BATCH_CHUNK_CELLS // (int(segments[order[end - 1]]) + 1))
+                if start + chunk_rows >= end:
+                    break
+                end = start + chunk_rows
+            rows = order[start:end]
+            start = end
+
+            chunk_segments = int(segments[rows[-1]])
+            seg = segments[rows][:, None]
+            segment_len = lengths_m[rows][:, None] / seg
+            all_positions = np.arange(chunk_segments + 1)[None, :]
+
+            if closed_form:
+                # ללא פרופיל מספיק לחשב את ההפסד בסוף הקו בלבד
+                fractions = all_positions / seg if return_profiles else np.ones((1, 1))
+                graph_loss = self._closed_form_continuous_losses(
+                    lengths_m[rows][:, None], total_flow[rows][:, None], internal[rows][:, None],
+                    total_k[rows][:, None], fractions)
+            else:
+                positions = all_positions[:, :-1]
+                in_line = positions < seg
+                flow_drop = total_flow[rows][:, None] / seg
+                segment_flows = np.where(in_line, np.maximum(total_flow[rows][:, None] - flow_drop * positions, 0.0), 0.0)
+
+                losses, _, _, _ = self._calc_segment_losses_vectorized(
+                    segment_flows, internal[rows][:, None], segment_len, total_k[rows][:, None] / seg)
+                graph_loss = np.concatenate((np.zeros((len(seg), 1)), np.cumsum(losses, axis=1)), axis=1)
+
+            # מקטעי הריפוד (מעבר לסוף הקו) ללא זרימה, ולכן העמודה האחרונה היא ההפסד הכולל
+            required_inlet[rows] = (self.MIN_END_PRESSURE + graph_loss[:, -1]) * self.SAFETY_MARGIN
+
+            if return_profiles:
+                valid = all_positions <= seg
+                profile_x[rows, :chunk_segments + 1] = np.where(valid, all_positions * segment_len, np.nan)
+                profile_pressure[rows, :chunk_segments + 1] = np.where(
+                    valid, required_inlet[rows][:, None] - graph_loss, np.nan)
+
+        results = {
+            "recommended_pipe_mm": nominal,
+            "internal_dia_mm": internal,
+            "total_flow_lh": total_flow,
+            "required_inlet_pressure_bar": required_inlet,
+        }
+        if return_profiles:
+            results["profile_x"] = profile_x
+            results["profile_pressure"] = profile_pressure
+        return results
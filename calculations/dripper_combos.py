@@ -0,0 +1,74 @@
+"""
+Dripper Combination Module
+Precomputed table of dripper combinations for matching the flow required by a planter
+"""
+
+from functools import lru_cache
+from itertools import combinations_with_replacement
+
+import numpy as np
+
+class DripperComboTable:
+    """
+    Every combination of up to max_emitters drippers, reduced to the preferred
+    combination for each total flow. Finding the combination nearest to a target
+    flow is then a binary search, whatever the number of planters.
+    """
+
+    def __init__(self, dripper_flows, max_emitters=3):
+        flows = sorted({float(f) for f in dripper_flows if f > 0}, reverse=True)
+        if not flows:
+            raise ValueError("No dripper flow rates available")
+        if max_emitters < 1:
+            raise ValueError("max_emitters must be at least 1")
+
+        self.flows = tuple(flows)
+        self.max_emitters = max_emitters
+
+        # סדר המעבר: קודם מעט טפטפות, ואז טפטפות גדולות קודם.
+        # לכל סכום נשמר השילוב הראשון - הוא המועדף במקרה של תיקו במרחק מהיעד.
+        # הטפטפת הקטנה ביותר לבדה היא נקודת ההתחלה, ולכן מנצחת כל תיקו
+        best = {self.flows[-1]: (-1, (self.flows[-1],))}
+        rank = 0
+        for count in range(1, max_emitters + 1):
+            for combo in combinations_with_replacement(self.flows, count):
+                # עיגול מבטל רעש נקודה צפה בין סדרי חיבור שונים של אותן טפטפות
+                total = round(sum(combo), 9)
+                if total not in best:
+                    best[total] = (rank, combo)
+                rank += 1
+
+        self.sums = np.array(sorted(best), dtype=float)
+        self.ranks = np.array([best[s][0] for s in self.sums])
+        self.combos = [best[s][1] for s in self.sums]
+
+    def lookup_indices(self, target_flows):
+        """Index (into sums/combos) of the nearest combination for every target flow"""
+        targets = np.asarray(target_flows, dtype=float)
+        last = len(self.sums) - 1
+        upper = np.clip(np.searchsorted(self.sums, targets), 0, last)
+        lower = np.clip(upper - 1, 0, last)
+
+        diff_lower = np.round(np.abs(self.sums[lower] - targets), 9)
+        diff_upper = np.round(np.abs(self.sums[upper] - targets), 9)
+        take_upper = (diff_upper < diff_lower) | \
+                     ((diff_upper == diff_lower) & (self.ranks[upper] < self.ranks[lower]))
+        return np.where(take_upper, upper, lower)
+
+    def lookup_flows(self, target_flows):
+        """Actual delivered flow of the nearest combination for every target flow"""
+        return self.sums[self.lookup_indices(target_flows)]
+
+    def combo_for(self, target_flow):
+        """Returns (description, actual flow) of the nearest combination to target_flow"""
+        index = int(self.lookup_indices(target_flow))
+        combo = self.combos[index]
+        actual_flow = float(self.sums[index])
+        combo_str = "+".join([str(d) for d in combo])
+        return f"{len(combo)}x ({combo_str} L/h)", actual_flow
+
+
+@lru_cache(maxsize=16)
+def get_combo_table(dripper_flows, max_emitters=3):
+    """Shared table per (dripper flows tuple, max emitters) - built once per process"""
+    return DripperComboTable(dripper_flows, max_emitters)
@@ -0,0 +1,146 @@
+"""
+Network Solver Module
+Hydraulic solution of tree-shaped layouts (main line with branches and outlets),
+built on the loss functions of IrrigationCalculator
+"""
+
+import numpy as np
+
+from calculations.calculation_engine import IrrigationCalculator
+
+class IrrigationNetwork:
+    """
+    Tree of pipes. Every node may draw an outlet flow; every node except the root is
+    fed by exactly one pipe from its parent (length, internal diameter, fitting K).
+    Flows are accumulated bottom-up and pressures top-down, both in linear time.
+    """
+
+    def __init__(self, calculator=None):
+        self.calculator = calculator if calculator is not None else IrrigationCalculator()
+
+        self.node_ids = []
+        self.index_of = {}
+        self.outflow = []
+        # צינור ההזנה של כל צומת (לשורש אין הורה)
+        self.parent = []
+        self.pipe_length = []
+        self.pipe_dia = []
+        self.pipe_k = []
+
+    def add_node(self, node_id, outflow_lh=0.0):
+        """Adds a node (junction or outlet) drawing outflow_lh"""
+        if node_id in self.index_of:
+            raise ValueError(f"Node {node_id} already exists")
+        self.index_of[node_id] = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.outflow.append(float(outflow_lh))
+        self.parent.append(-1)
+        self.pipe_length.append(0.0)
+        self.pipe_dia.append(0.0)
+        self.pipe_k.append(0.0)
+
+    def add_pipe(self, parent_id, child_id, length_m, internal_dia_mm, k_value=0.0):
+        """Connects child_id to parent_id with a pipe (the child node is created if missing)"""
+        if parent_id not in self.index_of:
+            raise ValueError(f"Unknown parent node {parent_id}")
+        if internal_dia_mm <= 0:
+            raise ValueError("Pipe internal diameter must be positive")
+        if child_id not in self.index_of:
+            self.add_node(child_id)
+        child = self.index_of[child_id]
+        if self.parent[child] != -1:
+            raise ValueError(f"Node {child_id} is already fed by another pipe")
+        self.parent[child] = self.index_of[parent_id]
+        self.pipe_length[child] = float(length_m)
+        self.pipe_dia[child] = float(internal_dia_mm)
+        self.pipe_k[child] = float(k_value)
+
+    def add_lateral(self, parent_id, name, length_m, internal_dia_mm, outlet_flows_lh, k_value=0.0):
+        """
+        Adds a straight lateral with evenly spaced outlets as a chain of nodes
+        named (name, 1) ... (name, n). The fitting K is spread over its segments.
+        Returns the id of the last outlet.
+        """
+        count = len(outlet_flows_lh)
+        if count == 0:
+            raise ValueError("A lateral needs at least one outlet")
+        previous = parent_id
+        for i, flow in enumerate(outlet_flows_lh):
+            node_id = (name, i + 1)
+            self.add_node(node_id, flow)
+            self.add_pipe(previous, node_id, length_m / count, internal_dia_mm, k_value / count)
+            previous = node_id
+        return previous
+
+    def _traversal_order(self, root):
+        """Breadth-first order from the root (parents always before their children)"""
+        children = [[] for _ in self.node_ids]
+        for child, parent in enumerate(self.parent):
+            if parent != -1:
+                children[parent].append(child)
+
+        order = [root]
+        for idx in order:
+            order.extend(children[idx])
+        if len(order) != len(self.node_ids):
+            raise ValueError("Network is not a single tree connected to the root")
+        return order
+
+    def solve(self, root_id, inlet_pressure_bar=None):
+        """
+        Solves flows and pressures of the tree fed at root_id.
+        Without inlet_pressure_bar, the inlet is set so the lowest-pressure node gets
+        MIN_END_PRESSURE (with the calculator's safety margin).
+        """
+        if root_id not in self.index_of:
+            raise ValueError(f"Unknown root node {root_id}")
+        root = self.index_of[root_id]
+        if self.parent[root] != -1:
+            raise ValueError(f"Root node {root_id} is fed by a pipe")
+
+        order = self._traversal_order(root)
+        parent = self.parent
+
+        # ספיקות: מהעלים אל השורש
+        flow = list(self.outflow)
+        for idx in reversed(order[1:]):
+            flow[parent[idx]] += flow[idx]
+
+        # הפסדי כל הצינורות בבת אחת - כל צינור נושא את ספיקת תת-העץ של הצומת שהוא מזין
+        calc = self.calculator
+        pipes = np.flatnonzero(np.array(parent) != -1)
+        edge_loss = np.zeros(len(order))
+        edge_loss[pipes], _, _, _ = calc._calc_segment_losses_vectorized(
+            np.array(flow)[pipes], np.array(self.pipe_dia)[pipes],
+            np.array(self.pipe_length)[pipes], np.array(self.pipe_k)[pipes])
+        edge_loss = edge_loss.tolist()
+
+        # הפסד מצטבר: מהשורש אל העלים
+        loss_to = [0.0] * len(order)
+        for idx in order[1:]:
+            loss_to[idx] = loss_to[parent[idx]] + edge_loss[idx]
+
+        critical = max(order, key=loss_to.__getitem__)
+        max_loss = loss_to[critical]
+        required_inlet = (calc.MIN_END_PRESSURE + max_loss) * calc.SAFETY_MARGIN
+        if inlet_pressure_bar is None:
+            inlet_pressure_bar = required_inlet
+
+        path = []
+        idx = critical
+        while idx != -1:
+            path.append(self.node_ids[idx])
+            idx = parent[idx]
+        path.reverse()
+
+        return {
+            "type": "network",
+            "total_flow_lh": round(flow[root], 2),
+            "required_inlet_pressure_bar": round(required_inlet, 3),
+            "inlet_pressure_bar": round(inlet_pressure_bar, 3),
+            "min_pressure_bar": round(inlet_pressure_bar - max_loss, 3),
+            "critical_node": self.node_ids[critical],
+            "critical_path": path,
+            "node_flows_lh": dict(zip(self.node_ids, flow)),
+            "node_pressures_bar": {self.node_ids[i]: inlet_pressure_bar - loss_to[i] for i in order}
+        }
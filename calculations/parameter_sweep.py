@@ -0,0 +1,135 @@
+"""
+Parameter Sweep Module
+Sensitivity analysis over a grid of designs, sharded across all CPU cores
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from calculations.calculation_engine import IrrigationCalculator, SEGMENTATION_AUTO
+from catalog.catalog_cache import create_snapshot, install_snapshot
+
+# מחשבון אחד לכל תהליך עובד - הקטלוג נטען פעם אחת בתהליך ולא בכל חישוב
+_worker_calculator = None
+
+def _init_worker(db_path, snapshot=None):
+    global _worker_calculator
+    if snapshot is not None:
+        # הקטלוג נטען מתמונת המצב שהתקבלה - העובד לא פותח את קובץ המסד
+        install_snapshot(db_path, snapshot)
+    _worker_calculator = IrrigationCalculator(db_path)
+
+def _run_shard(axes, planters, segmentation, start, stop):
+    """Evaluates grid designs [start, stop) and returns their columns"""
+    shape = tuple(len(axis) for axis in axes)
+    coords = np.unravel_index(np.arange(start, stop), shape)
+    lengths, flows, outlets, elbows, tees, straights = [axis[c] for axis, c in zip(axes, coords)]
+
+    res = _worker_calculator.calculate_batch(
+        lengths, flows, elbows, tees, straights,
+        num_outlets=outlets if planters else None,
+        segmentation=segmentation)
+    return start, stop, {
+        "recommended_pipe_mm": res["recommended_pipe_mm"],
+        "total_flow_lh": res["total_flow_lh"],
+        "required_inlet_pressure_bar": res["required_inlet_pressure_bar"],
+    }
+
+
+class ParameterSweep:
+    """
+    Full grid of lengths x flows x outlet counts x connector counts.
+    Without num_outlets every design is a continuous-soil lateral and flows_lh is its
+    total flow; with num_outlets flows_lh is the required flow per outlet.
+    """
+
+    INPUT_COLUMNS = ("length_m", "flow_lh", "num_outlets", "elbows", "tees", "straights")
+    OUTPUT_COLUMNS = ("recommended_pipe_mm", "total_flow_lh", "required_inlet_pressure_bar")
+    # שארד קטן מסתיים מהר - ביטול לא מחכה לחישוב ארוך, וההתקדמות מתעדכנת לעתים קרובות
+    SHARD_SIZE = 2000
+    # כל כמה שניות בודקים את אירוע הביטול בזמן שהשארדים רצים
+    CANCEL_POLL_S = 0.1
+
+    def __init__(self, lengths_m, flows_lh, num_outlets=None, elbows=(0,), tees=(0,), straights=(0,),
+                 segmentation=SEGMENTATION_AUTO, db_path=None):
+        self.planters = num_outlets is not None
+        self.axes = [
+            np.asarray(lengths_m, dtype=float),
+            np.asarray(flows_lh, dtype=float),
+            np.asarray(num_outlets if self.planters else (0,), dtype=int),
+            np.asarray(elbows, dtype=float),
+            np.asarray(tees, dtype=float),
+            np.asarray(straights, dtype=float),
+        ]
+        self.segmentation = segmentation
+        self.db_path = db_path if db_path is not None else IrrigationCalculator().db_path
+
+    @property
+    def size(self):
+        return int(np.prod([len(axis) for axis in self.axes]))
+
+    def input_columns(self):
+        """The grid itself as columns (one row per design)"""
+        coords = np.unravel_index(np.arange(self.size), tuple(len(axis) for axis in self.axes))
+        return {name: axis[c] for name, axis, c in zip(self.INPUT_COLUMNS, self.axes, coords)}
+
+    def run(self, max_workers=None, shard_size=None, progress=None, cancel_event=None):
+        """
+        Shards the grid across a process pool and fills a columnar table as shards finish.
+
+        The catalog is serialized once and handed to every worker (see create_snapshot),
+        its size is reported as catalog_snapshot_bytes.
+        progress(done_designs, total_designs) is called after every shard. cancel_event
+        (e.g. threading.Event) is checked every CANCEL_POLL_S seconds; once it is set,
+        pending shards are dropped, running shards are not waited for, and the partial
+        table is returned; rows that were not computed are NaN and False in the
+        "completed" column.
+        """
+        total = self.size
+        table = self.input_columns()
+        for name in self.OUTPUT_COLUMNS:
+            table[name] = np.full(total, np.nan)
+        table["completed"] = np.zeros(total, dtype=bool)
+
+        done = 0
+        cancelled = False
+        shard_size = shard_size or self.SHARD_SIZE
+        max_workers = max_workers or os.cpu_count() or 1
+        snapshot = create_snapshot(self.db_path)
+
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                       initargs=(self.db_path, snapshot))
+        try:
+            pending = {
+                executor.submit(_run_shard, self.axes, self.planters, self.segmentation,
+                                start, min(start + shard_size, total))
+                for start in range(0, total, shard_size)
+            }
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+                finished, pending = wait(pending, timeout=self.CANCEL_POLL_S,
+                                         return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, stop, columns = future.result()
+                    for name, values in columns.items():
+                        table[name][start:stop] = values
+                    table["completed"][start:stop] = True
+
+                    done += stop - start
+                    if progress is not None:
+                        progress(done, total)
+        finally:
+            # בביטול (או שגיאה) לא מחכים לשארדים שכבר רצים - התוצאות שלהם פשוט לא נאספות
+            executor.shutdown(wait=not cancelled, cancel_futures=True)
+
+        return {
+            "table": table,
+            "completed_designs": done,
+            "total_designs": total,
+            "cancelled": cancelled,
+            "catalog_snapshot_bytes": len(snapshot),
+        }
@@ -5,178 +5,478 @@ SQLite database for storing pipes, drippers, fittings, and other components
 
 import sqlite3
 import os
+import re
+import threading
+
+def parse_flow_rates(text):
+    """Flow values (L/h) in a catalog flow_rates text like "1.0/2.0 / 4.0 / 8.0 L/h", smallest first"""
+    return sorted({float(n) for n in re.findall(r"\d+(?:\.\d+)?", text or "") if float(n) > 0})
 
 class Database:
     """
-    Manages the component database (pipes, drippers, fittings)
+    Manages the component database (pipes, drippers, fittings).
+    Holds one persistent connection per thread (WAL mode, statement cache reused
+    between calls); use it as a context manager or call close() to release them.
+    The schema is versioned: opening a file older than SCHEMA_VERSION applies the
+    missing MIGRATIONS once, a current file only costs a version query. An older file
+    that cannot be written is opened without migrating (read_only is set); queries
+    of later schema versions fall back to the older tables where they can.
     """
     
-    def __init__(self, db_path="catalog/components.db"):
+    # מונה כתיבות לכל קובץ מסד נתונים - מאפשר למטמון הקטלוג לזהות שינוי ולהיטען מחדש
+    _generations = {}
+    
+    # עמודות הנתונים של כל טבלת רכיבים (ללא id), והמפתח הטבעי לזיהוי רכיב קיים בייבוא
+    COMPONENT_COLUMNS = {
+        "pipes": ("pipe_type", "nominal_diameter_mm", "wall_thickness_mm", "internal_diameter_mm", "flow_type", "notes"),
+        "drippers": ("dripper_type", "flow_rates", "physical_type", "exponent_x", "min_pressure_bar", "max_pressure_bar", "notes"),
+        "fittings": ("fitting_name", "engineering_symbol", "k_value_small", "k_value_large", "description"),
+    }
+    NATURAL_KEYS = {
+        "pipes": ("pipe_type", "nominal_diameter_mm"),
+        "drippers": ("dripper_type",),
+        "fittings": ("fitting_name",),
+    }
+    
+    # שדרוגי סכמה לפי הסדר: (גרסה, מתודה). שינוי סכמה חדש = מתודה חדשה בסוף הרשימה
+    MIGRATIONS = (
+        (1, "_migrate_base_schema"),
+        (2, "_migrate_indexes"),
+        (3, "_migrate_dripper_flow_rates"),
+    )
+    SCHEMA_VERSION = MIGRATIONS[-1][0]
+    _migration_lock = threading.Lock()
+    
+    def __init__(self, db_path="catalog/components.db", cached_statements=128, snapshot=None):
         self.db_path = db_path
+        self.cached_statements = cached_statements
+        # תמונת מצב מ-serialize(): כל החיבורים הם עותקים בזיכרון לקריאה בלבד והקובץ לא נפתח
+        self.snapshot = snapshot
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.read_only = False
         self.init_database()
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def get_connection(self):
+        """Returns this thread's connection, opening it on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.snapshot is not None:
+                connection = self._snapshot_connection()
+            else:
+                connection = sqlite3.connect(self.db_path, cached_statements=self.cached_statements,
+                                             check_same_thread=False)
+                try:
+                    # WAL: קוראים לא נחסמים בזמן כתיבה, וכתיבה לא ממתינה לקוראים
+                    connection.execute("PRAGMA journal_mode=WAL")
+                except sqlite3.OperationalError:
+                    pass  # קובץ לקריאה בלבד - נשארים במצב היומן הקיים
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+    
+    def _snapshot_connection(self):
+        connection = sqlite3.connect(":memory:", cached_statements=self.cached_statements,
+                                     check_same_thread=False)
+        if isinstance(self.snapshot, str):
+            connection.executescript(self.snapshot)
+        else:
+            connection.deserialize(self.snapshot)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+    
+    def serialize(self):
+        """
+        Snapshot of the whole database for Database(snapshot=...): the page image as bytes,
+        or an SQL script on Python versions without Connection.serialize (before 3.11)
+        """
+        memory = sqlite3.connect(":memory:")
+        try:
+            self.get_connection().backup(memory)
+            if not hasattr(memory, "serialize"):
+                return "\n".join(memory.iterdump())
+            # VACUUM כותב מחדש את הכותרת ללא סימון WAL - אחרת לא ניתן לטעון את התמונה לזיכרון
+            memory.execute("VACUUM")
+            return memory.serialize()
+        finally:
+            memory.close()
+    
+    def close(self):
+        """Closes the connections of all threads"""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+            self._local = threading.local()
+    
     def init_database(self):
-        """Initialize database with all component tables"""
-        if not os.path.exists(self.db_path):
-            connection = sqlite3.connect(self.db_path)
-            cursor = connection.cursor()
-            
-            # ===== PIPES TABLE =====
+        """
+        Bring the database up to SCHEMA_VERSION. A current database costs one version query;
+        otherwise the missing migrations run in a single write transaction.
+        """
+        version = self.get_schema_version()
+        if version == self.SCHEMA_VERSION:
+            return
+        if version > self.SCHEMA_VERSION:
+            raise ValueError(f"Database schema version {version} is newer than supported ({self.SCHEMA_VERSION})")
+        
+        # תמונת מצב או קובץ ללא הרשאת כתיבה - לא משדרגים, עובדים עם הסכמה הקיימת
+        if self.snapshot is not None or not os.access(self.db_path, os.W_OK):
+            self.read_only = True
+            return
+        
+        connection = self.get_connection()
+        with Database._migration_lock:
+            # IMMEDIATE נועל את הקובץ לכתיבה - תהליך אחר שמשדרג במקביל ימתין ולא ישדרג פעמיים
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.get_schema_version()
+                connection.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                for target, migration in self.MIGRATIONS:
+                    if target > version:
+                        getattr(self, migration)(connection)
+                        connection.execute("INSERT INTO schema_version (version) VALUES (?)", (target,))
+                connection.commit()
+            except sqlite3.OperationalError as e:
+                connection.rollback()
+                # הקובץ נפתח לקריאה בלבד למרות ההרשאות (למשל מערכת קבצים לקריאה בלבד)
+                if "readonly" not in str(e):
+                    raise
+                self.read_only = True
+            except BaseException:
+                connection.rollback()
+                raise
+    
+    def get_schema_version(self):
+        """Schema version of the database file (0 for files created before versioning)"""
+        try:
+            row = self.get_connection().execute("SELECT MAX(version) FROM schema_version").fetchone()
+        except sqlite3.OperationalError:
+            return 0  # אין טבלת גרסאות
+        return row[0] or 0
+    
+    def _migrate_base_schema(self, connection):
+        """v1: component tables, seeded with the default catalog in a new database"""
+        cursor = connection.cursor()
+        existing = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pipes'").fetchone()
+        
+        # ===== PIPES TABLE =====
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipes (
+                id INTEGER PRIMARY KEY,
+                pipe_type TEXT NOT NULL,
+                nominal_diameter_mm REAL NOT NULL,
+                wall_thickness_mm REAL NOT NULL,
+                internal_diameter_mm REAL NOT NULL,
+                flow_type TEXT NOT NULL,
+                notes TEXT
+            )
+        """)
+        
+        # ===== DRIPPERS TABLE =====
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS drippers (
+                id INTEGER PRIMARY KEY,
+                dripper_type TEXT NOT NULL,
+                flow_rates TEXT NOT NULL,
+                physical_type TEXT NOT NULL,
+                exponent_x REAL NOT NULL,
+                min_pressure_bar REAL NOT NULL,
+                max_pressure_bar REAL NOT NULL,
+                notes TEXT
+            )
+        """)
+        
+        # ===== FITTINGS TABLE =====
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fittings (
+                id INTEGER PRIMARY KEY,
+                fitting_name TEXT NOT NULL,
+                engineering_symbol TEXT NOT NULL,
+                k_value_small REAL NOT NULL,
+                k_value_large REAL NOT NULL,
+                description TEXT
+            )
+        """)
+        
+        # נתוני ברירת מחדל רק בקובץ חדש - לא בקטלוג קיים שהמשתמש רוקן
+        if existing:
+            return
+        
+        # Insert default pipes data
+        pipes_data = [
+            ("צינורית (Spaghetti)", 5.0, 1.0, 3.0, "למינרית/טורבולנטית", "לחיבור אביזרי קצה בלבד"),
+            ("צינור 16 (סטנדרט)", 16.0, 1.2, 13.6, "טורבולנטית", 'הצינור הכי נפוץ ("מוביל")'),
+            ("צינור 20", 20.0, 1.4, 17.2, "טורבולנטית", "לשלוחות ארוכות"),
+            ("צינור 25", 25.0, 1.5, 22.0, "טורבולנטית", "קו ראשי לגינה בינונית"),
+            ("צינור 32", 32.0, 2.0, 28.0, "טורבולנטית", "קו ראשי / מוביל מים"),
+            ("צינור 50", 50.0, 3.0, 44.0, "טורבולנטית", "קו ראשי לחקלאות/פארקים"),
+            ("צינור 63", 63.0, 3.8, 55.4, "טורבולנטית", "קו ראשי למרחקים גדולים"),
+        ]
+        
+        for pipe in pipes_data:
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS pipes (
-                    id INTEGER PRIMARY KEY,
-                    pipe_type TEXT NOT NULL,
-                    nominal_diameter_mm REAL NOT NULL,
-                    wall_thickness_mm REAL NOT NULL,
-                    internal_diameter_mm REAL NOT NULL,
-                    flow_type TEXT NOT NULL,
-                    notes TEXT
-                )
-            """)
-            
-            # ===== DRIPPERS TABLE =====
+                INSERT INTO pipes 
+                (pipe_type, nominal_diameter_mm, wall_thickness_mm, internal_diameter_mm, flow_type, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, pipe)
+        
+        # Insert default drippers data
+        drippers_data = [
+            ("טפטפת נעץ (Button)", "1.0/2.0 / 4.0 / 8.0 L/h", "חיצונית לצינור", 0.5, 1.0, 4.0, "תלוי דגם"),
+        ]
+        
+        for dripper in drippers_data:
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS drippers (
-                    id INTEGER PRIMARY KEY,
-                    dripper_type TEXT NOT NULL,
-                    flow_rates TEXT NOT NULL,
-                    physical_type TEXT NOT NULL,
-                    exponent_x REAL NOT NULL,
-                    min_pressure_bar REAL NOT NULL,
-                    max_pressure_bar REAL NOT NULL,
-                    notes TEXT
-                )
-            """)
-            
-            # ===== FITTINGS TABLE =====
+                INSERT INTO drippers 
+                (dripper_type, flow_rates, physical_type, exponent_x, min_pressure_bar, max_pressure_bar, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, dripper)
+        
+        # Insert default fittings data
+        fittings_data = [
+            ("מחבר שן (Coupling)", "=", 0.6, 0.4, "חיבור ישר בין צינורות"),
+            ("זווית 90 (Elbow)", "L", 1.3, 1.1, "שינוי כיוון 90 מעלות"),
+            ("הסתעפות T (זרימה ישרה)", "T-run", 0.6, 0.5, "המשך ישר עם ענף צד"),
+            ("הסתעפות T (פנייה)", "T-branch", 1.8, 1.5, "פנייה בזווית מהקו הראשי"),
+            ("כניסה לצינור (Saddle/Start)", "Inlet", 0.8, 0.6, "התחלת קו מהמקור"),
+        ]
+        
+        for fitting in fittings_data:
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS fittings (
-                    id INTEGER PRIMARY KEY,
-                    fitting_name TEXT NOT NULL,
-                    engineering_symbol TEXT NOT NULL,
-                    k_value_small REAL NOT NULL,
-                    k_value_large REAL NOT NULL,
-                    description TEXT
-                )
-            """)
-            
-            # Insert default pipes data
-            pipes_data = [
-                ("צינורית (Spaghetti)", 5.0, 1.0, 3.0, "למינרית/טורבולנטית", "לחיבור אביזרי קצה בלבד"),
-                ("צינור 16 (סטנדרט)", 16.0, 1.2, 13.6, "טורבולנטית", 'הצינור הכי נפוץ ("מוביל")'),
-                ("צינור 20", 20.0, 1.4, 17.2, "טורבולנטית", "לשלוחות ארוכות"),
-                ("צינור 25", 25.0, 1.5, 22.0, "טורבולנטית", "קו ראשי לגינה בינונית"),
-                ("צינור 32", 32.0, 2.0, 28.0, "טורבולנטית", "קו ראשי / מוביל מים"),
-                ("צינור 50", 50.0, 3.0, 44.0, "טורבולנטית", "קו ראשי לחקלאות/פארקים"),
-                ("צינור 63", 63.0, 3.8, 55.4, "טורבולנטית", "קו ראשי למרחקים גדולים"),
-            ]
-            
-            for pipe in pipes_data:
-                cursor.execute("""
-                    INSERT INTO pipes 
-                    (pipe_type, nominal_diameter_mm, wall_thickness_mm, internal_diameter_mm, flow_type, notes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, pipe)
-            
-            # Insert default drippers data
-            drippers_data = [
-                ("טפטפת נעץ (Button)", "1.0/2.0 / 4.0 / 8.0 L/h", "חיצונית לצינור", 0.5, 1.0, 4.0, "תלוי דגם"),
-            ]
-            
-            for dripper in drippers_data:
-                cursor.execute("""
-                    INSERT INTO drippers 
-                    (dripper_type, flow_rates, physical_type, exponent_x, min_pressure_bar, max_pressure_bar, notes)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, dripper)
-            
-            # Insert default fittings data
-            fittings_data = [
-                ("מחבר שן (Coupling)", "=", 0.6, 0.4, "חיבור ישר בין צינורות"),
-                ("זווית 90 (Elbow)", "L", 1.3, 1.1, "שינוי כיוון 90 מעלות"),
-                ("הסתעפות T (זרימה ישרה)", "T-run", 0.6, 0.5, "המשך ישר עם ענף צד"),
-                ("הסתעפות T (פנייה)", "T-branch", 1.8, 1.5, "פנייה בזווית מהקו הראשי"),
-                ("כניסה לצינור (Saddle/Start)", "Inlet", 0.8, 0.6, "התחלת קו מהמקור"),
-            ]
-            
-            for fitting in fittings_data:
-                cursor.execute("""
-                    INSERT INTO fittings 
-                    (fitting_name, engineering_symbol, k_value_small, k_value_large, description)
-                    VALUES (?, ?, ?, ?, ?)
-                """, fitting)
-            
-            connection.commit()
-            connection.close()
+                INSERT INTO fittings 
+                (fitting_name, engineering_symbol, k_value_small, k_value_large, description)
+                VALUES (?, ?, ?, ?, ?)
+            """, fitting)
+    
+    def _migrate_indexes(self, connection):
+        """v2: lookup indexes"""
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_pipes_nominal ON pipes (nominal_diameter_mm)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_pipes_internal ON pipes (internal_diameter_mm)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_pipes_type ON pipes (pipe_type)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_drippers_type ON drippers (dripper_type)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_drippers_flow_rates ON drippers (flow_rates)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_fittings_symbol ON fittings (engineering_symbol)")
+    
+    def _migrate_dripper_flow_rates(self, connection):
+        """v3: dripper_flow_rates child table (one row per dripper model and flow), filled from flow_rates text"""
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS dripper_flow_rates (
+                dripper_id INTEGER NOT NULL REFERENCES drippers (id) ON DELETE CASCADE,
+                flow_rate_lh REAL NOT NULL,
+                PRIMARY KEY (dripper_id, flow_rate_lh)
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_dripper_flow_rates_flow ON dripper_flow_rates (flow_rate_lh)")
+        self._sync_dripper_flow_rates(connection)
+    
+    def _sync_dripper_flow_rates(self, connection, dripper_ids=None):
+        """Rebuild the flow rows of dripper_ids (all drippers if None) from their flow_rates text"""
+        if dripper_ids is None:
+            drippers = connection.execute("SELECT id, flow_rates FROM drippers").fetchall()
+            connection.execute("DELETE FROM dripper_flow_rates")
+        else:
+            dripper_ids = list(dripper_ids)
+            drippers = []
+            # מגבלת מספר הפרמטרים של SQLite - בקבוצות
+            for start in range(0, len(dripper_ids), 500):
+                chunk = dripper_ids[start:start + 500]
+                marks = ", ".join("?" for _ in chunk)
+                drippers += connection.execute(f"SELECT id, flow_rates FROM drippers WHERE id IN ({marks})", chunk).fetchall()
+            connection.executemany("DELETE FROM dripper_flow_rates WHERE dripper_id = ?", [(i,) for i in dripper_ids])
+        connection.executemany(
+            "INSERT INTO dripper_flow_rates (dripper_id, flow_rate_lh) VALUES (?, ?)",
+            [(dripper_id, flow) for dripper_id, text in drippers for flow in parse_flow_rates(text)])
+    
+    @classmethod
+    def get_generation(cls, db_path):
+        """Number of catalog writes made to db_path by this process"""
+        return cls._generations.get(os.path.abspath(db_path), 0)
+    
+    def _mark_changed(self):
+        key = os.path.abspath(self.db_path)
+        Database._generations[key] = Database._generations.get(key, 0) + 1
     
     def get_all_pipes(self):
         """Retrieve all pipes from catalog"""
-        connection = sqlite3.connect(self.db_path)
+        connection = self.get_connection()
         cursor = connection.cursor()
         cursor.execute("SELECT * FROM pipes")
         pipes = cursor.fetchall()
-        connection.close()
         return pipes
     
     def get_pipe_by_diameter(self, diameter):
         """Get pipe specifications by nominal diameter"""
-        connection = sqlite3.connect(self.db_path)
+        connection = self.get_connection()
         cursor = connection.cursor()
         cursor.execute("SELECT * FROM pipes WHERE nominal_diameter_mm = ?", (diameter,))
         pipe = cursor.fetchone()
-        connection.close()
         return pipe
     
+    def get_nearest_pipe(self, diameter):
+        """Get the pipe whose nominal diameter is closest to diameter (the larger one on a tie)"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        cursor.execute("SELECT * FROM pipes WHERE nominal_diameter_mm >= ? ORDER BY nominal_diameter_mm LIMIT 1", (diameter,))
+        above = cursor.fetchone()
+        cursor.execute("SELECT * FROM pipes WHERE nominal_diameter_mm <= ? ORDER BY nominal_diameter_mm DESC LIMIT 1", (diameter,))
+        below = cursor.fetchone()
+        if above is None or below is None:
+            return above or below
+        return below if diameter - below[2] < above[2] - diameter else above
+    
+    def get_pipes_in_range(self, min_diameter, max_diameter):
+        """Get all pipes with nominal diameter between min_diameter and max_diameter, smallest first"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT * FROM pipes WHERE nominal_diameter_mm BETWEEN ? AND ?
+            ORDER BY nominal_diameter_mm
+        """, (min_diameter, max_diameter))
+        return cursor.fetchall()
+    
+    def get_smallest_pipe_with_internal(self, min_internal_diameter):
+        """Get the pipe with the smallest internal diameter that is at least min_internal_diameter"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT * FROM pipes WHERE internal_diameter_mm >= ?
+            ORDER BY internal_diameter_mm LIMIT 1
+        """, (min_internal_diameter,))
+        return cursor.fetchone()
+    
     def get_all_drippers(self):
         """Retrieve all drippers from catalog"""
-        connection = sqlite3.connect(self.db_path)
+        connection = self.get_connection()
         cursor = connection.cursor()
         cursor.execute("SELECT * FROM drippers")
         drippers = cursor.fetchall()
-        connection.close()
         return drippers
     
+    def get_dripper_flow_rates(self, dripper_id=None):
+        """
+        Retrieve (dripper_id, flow_rate_lh) rows of one dripper (or of all drippers), smallest flow first.
+        On a read-only file older than schema v3 the rows are parsed from the flow_rates text.
+        """
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        try:
+            if dripper_id is None:
+                cursor.execute("SELECT dripper_id, flow_rate_lh FROM dripper_flow_rates ORDER BY dripper_id, flow_rate_lh")
+            else:
+                cursor.execute("SELECT dripper_id, flow_rate_lh FROM dripper_flow_rates WHERE dripper_id = ? ORDER BY flow_rate_lh",
+                               (dripper_id,))
+            return cursor.fetchall()
+        except sqlite3.OperationalError:
+            if not self.read_only:
+                raise
+        if dripper_id is None:
+            cursor.execute("SELECT id, flow_rates FROM drippers ORDER BY id")
+        else:
+            cursor.execute("SELECT id, flow_rates FROM drippers WHERE id = ?", (dripper_id,))
+        return [(row_id, flow) for row_id, text in cursor.fetchall() for flow in parse_flow_rates(text)]
+    
     def get_all_fittings(self):
         """Retrieve all fittings from catalog"""
-        connection = sqlite3.connect(self.db_path)
+        connection = self.get_connection()
         cursor = connection.cursor()
         cursor.execute("SELECT * FROM fittings")
         fittings = cursor.fetchall()
-        connection.close()
         return fittings
     
     def add_custom_pipe(self, pipe_type, nominal_diameter, wall_thickness, internal_diameter, flow_type, notes=""):
         """Add custom pipe to catalog"""
-        connection = sqlite3.connect(self.db_path)
-        cursor = connection.cursor()
-        cursor.execute("""
-            INSERT INTO pipes 
-            (pipe_type, nominal_diameter_mm, wall_thickness_mm, internal_diameter_mm, flow_type, notes)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (pipe_type, nominal_diameter, wall_thickness, internal_diameter, flow_type, notes))
-        connection.commit()
-        connection.close()
+        connection = self.get_connection()
+        with connection:
+            connection.execute("""
+                INSERT INTO pipes 
+                (pipe_type, nominal_diameter_mm, wall_thickness_mm, internal_diameter_mm, flow_type, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (pipe_type, nominal_diameter, wall_thickness, internal_diameter, flow_type, notes))
+        self._mark_changed()
     
     def add_custom_dripper(self, dripper_type, flow_rates, physical_type, exponent_x, min_pressure, max_pressure, notes=""):
         """Add custom dripper to catalog"""
-        connection = sqlite3.connect(self.db_path)
-        cursor = connection.cursor()
-        cursor.execute("""
-            INSERT INTO drippers 
-            (dripper_type, flow_rates, physical_type, exponent_x, min_pressure_bar, max_pressure_bar, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (dripper_type, flow_rates, physical_type, exponent_x, min_pressure, max_pressure, notes))
-        connection.commit()
-        connection.close()
+        connection = self.get_connection()
+        with connection:
+            cursor = connection.execute("""
+                INSERT INTO drippers 
+                (dripper_type, flow_rates, physical_type, exponent_x, min_pressure_bar, max_pressure_bar, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (dripper_type, flow_rates, physical_type, exponent_x, min_pressure, max_pressure, notes))
+            self._sync_dripper_flow_rates(connection, [cursor.lastrowid])
+        self._mark_changed()
     
     def add_custom_fitting(self, fitting_name, engineering_symbol, k_value_small, k_value_large, description=""):
         """Add custom fitting to catalog"""
-        connection = sqlite3.connect(self.db_path)
-        cursor = connection.cursor()
-        cursor.execute("""
-            INSERT INTO fittings 
-            (fitting_name, engineering_symbol, k_value_small, k_value_large, description)
-            VALUES (?, ?, ?, ?, ?)
-        """, (fitting_name, engineering_symbol, k_value_small, k_value_large, description))
-        connection.commit()
-        connection.close()
\ No newline at end of file
+        connection = self.get_connection()
+        with connection:
+            connection.execute("""
+                INSERT INTO fittings 
+                (fitting_name, engineering_symbol, k_value_small, k_value_large, description)
+                VALUES (?, ?, ?, ?, ?)
+            """, (fitting_name, engineering_symbol, k_value_small, k_value_large, description))
+        self._mark_changed()
+    
+    def bulk_upsert(self, components):
+        """
+        Inserts or updates many components in a single transaction.
+        components maps table name -> list of rows (tuples in COMPONENT_COLUMNS order).
+        A row whose natural key already exists updates that component.
+        Returns {table: (inserted, updated)}.
+        """
+        for table in components:
+            if table not in self.COMPONENT_COLUMNS:
+                raise ValueError(f"Unknown component table: {table}")
+        
+        counts = {}
+        connection = self.get_connection()
+        with connection:
+            for table, rows in components.items():
+                columns = self.COMPONENT_COLUMNS[table]
+                key_positions = [columns.index(k) for k in self.NATURAL_KEYS[table]]
+                key_sql = ", ".join(self.NATURAL_KEYS[table])
+                
+                existing = {}
+                for row in connection.execute(f"SELECT id, {key_sql} FROM {table}"):
+                    existing.setdefault(tuple(row[1:]), row[0])
+                
+                # שורות חוזרות עם אותו מפתח - האחרונה קובעת
+                latest = {}
+                for row in rows:
+                    latest[tuple(row[i] for i in key_positions)] = tuple(row)
+                
+                inserts, updates = [], []
+                for key, row in latest.items():
+                    row_id = existing.get(key)
+                    if row_id is None:
+                        inserts.append(row)
+                    else:
+                        updates.append(row + (row_id,))
+                
+                placeholders = ", ".join("?" for _ in columns)
+                assignments = ", ".join(f"{c} = ?" for c in columns)
+                connection.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", inserts)
+                connection.executemany(
+                    f"UPDATE {table} SET {assignments} WHERE id = ?", updates)
+                counts[table] = (len(inserts), len(updates))
+            
+            if "drippers" in components:
+                # מזהי השורות החדשות לא ידועים אחרי executemany - הטבלה הנלווית נבנית מחדש
+                self._sync_dripper_flow_rates(connection)
+        self._mark_changed()
+        return counts
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Catalog Cache Module
+Process-wide in-memory copy of the component catalog, so calculations
+do not open the SQLite file on every lookup
+"""
+
+import bisect
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from catalog.Database import Database
+
+class CatalogCache:
+    """
+    In-memory snapshot of one component database, indexed for fast lookups.
+    With snapshot (from create_snapshot) the catalog is read from that image
+    instead of the file; load_seconds and snapshot_bytes record the load cost.
+    fingerprint identifies the catalog content (equal content - equal fingerprint,
+    across processes), for caches of results that depend on the catalog.
+    """
+
+    def __init__(self, db_path, snapshot=None):
+        self.db_path = db_path
+        # הדור נקרא לפני הטעינה - כתיבה שתתבצע תוך כדי תגרום לטעינה מחדש בגישה הבאה
+        self.generation = Database.get_generation(db_path)
+        self.snapshot_bytes = len(snapshot) if snapshot is not None else 0
+        started = time.perf_counter()
+
+        with Database(db_path, snapshot=snapshot) as db:
+            self.pipes = db.get_all_pipes()
+            self.drippers = db.get_all_drippers()
+            self.fittings = db.get_all_fittings()
+            flow_rows = db.get_dripper_flow_rates()
+
+        # אינדקס לפי קוטר נומינלי (עמודה 2); השורה הראשונה קובעת, כמו ב-fetchone
+        self.pipes_by_diameter = {}
+        for pipe in self.pipes:
+            self.pipes_by_diameter.setdefault(pipe[2], pipe)
+        # רשימות ממוינות לחיפוש בינארי לפי קוטר נומינלי (2) ופנימי (4)
+        self.pipes_by_nominal = sorted(self.pipes, key=lambda p: (p[2], p[0]))
+        self.nominal_keys = [p[2] for p in self.pipes_by_nominal]
+        self.pipes_by_internal = sorted(self.pipes, key=lambda p: (p[4], p[0]))
+        self.internal_keys = [p[4] for p in self.pipes_by_internal]
+
+        # ספיקות כל דגם מהטבלה הנלווית, כמערכים מוכנים (לקריאה בלבד - משותפים לכל המחשבונים)
+        by_dripper = {}
+        for dripper_id, flow in flow_rows:
+            by_dripper.setdefault(dripper_id, []).append(flow)
+        self.dripper_flow_rates = {d: self._frozen_array(flows) for d, flows in by_dripper.items()}
+        self.fingerprint = hashlib.sha256(
+            repr((self.pipes, self.drippers, self.fittings, flow_rows)).encode("utf-8")).hexdigest()
+        self.load_seconds = time.perf_counter() - started
+
+    @staticmethod
+    def _frozen_array(values):
+        array = np.array(values, dtype=float)
+        array.setflags(write=False)
+        return array
+
+    def get_pipe_by_diameter(self, diameter):
+        """Get pipe specifications by nominal diameter"""
+        return self.pipes_by_diameter.get(diameter)
+
+    def get_nearest_pipe(self, diameter):
+        """Get the pipe whose nominal diameter is closest to diameter (the larger one on a tie)"""
+        if not self.pipes:
+            return None
+        exact = self.pipes_by_diameter.get(diameter)
+        if exact is not None:
+            return exact
+        pos = bisect.bisect_left(self.nominal_keys, diameter)
+        if pos == 0:
+            return self.pipes_by_nominal[0]
+        if pos == len(self.nominal_keys):
+            return self.pipes_by_nominal[-1]
+        below, above = self.pipes_by_nominal[pos - 1], self.pipes_by_nominal[pos]
+        return below if diameter - below[2] < above[2] - diameter else above
+
+    def get_pipes_in_range(self, min_diameter, max_diameter):
+        """Get all pipes with nominal diameter between min_diameter and max_diameter, smallest first"""
+        start = bisect.bisect_left(self.nominal_keys, min_diameter)
+        stop = bisect.bisect_right(self.nominal_keys, max_diameter)
+        return self.pipes_by_nominal[start:stop]
+
+    def get_smallest_pipe_with_internal(self, min_internal_diameter):
+        """Get the pipe with the smallest internal diameter that is at least min_internal_diameter"""
+        pos = bisect.bisect_left(self.internal_keys, min_internal_diameter)
+        return self.pipes_by_internal[pos] if pos < len(self.pipes_by_internal) else None
+
+    def get_dripper(self, dripper_id=None):
+        """Get dripper specifications by id (the first catalog dripper if no id is given)"""
+        if dripper_id is None:
+            return self.drippers[0] if self.drippers else None
+        for dripper in self.drippers:
+            if dripper[0] == dripper_id:
+                return dripper
+        return None
+
+    def get_dripper_flows(self, dripper_id):
+        """Available flows (L/h) of one dripper model, smallest first"""
+        return self.dripper_flow_rates.get(dripper_id, self._frozen_array(()))
+
+
+_caches = {}
+_lock = threading.Lock()
+
+def get_catalog(db_path):
+    """Returns the cached catalog of db_path, loading it again if the database was written to"""
+    key = os.path.abspath(db_path)
+    with _lock:
+        cache = _caches.get(key)
+        if cache is None or cache.generation != Database.get_generation(key):
+            cache = CatalogCache(key)
+            _caches[key] = cache
+        return cache
+
+def create_snapshot(db_path):
+    """Serialized image of db_path, loaded once and passed to worker processes instead of the file"""
+    with Database(db_path) as db:
+        return db.serialize()
+
+def install_snapshot(db_path, snapshot):
+    """Loads the catalog of db_path from snapshot, so later get_catalog(db_path) calls never open the file"""
+    key = os.path.abspath(db_path)
+    cache = CatalogCache(key, snapshot)
+    with _lock:
+        _caches[key] = cache
+    return cache
+
+def invalidate_catalog(db_path=None):
+    """Drops the cached catalog of db_path (or every cached catalog)"""
+    with _lock:
+        if db_path is None:
+            _caches.clear()
+        else:
+            _caches.pop(os.path.abspath(db_path), None)
@@ -0,0 +1,140 @@
+"""
+Catalog Import Module
+Bulk import of manufacturer catalogs (pipes, drippers, fittings) from CSV or JSON
+
+Usage:
+    python -m catalog.catalog_import pipes.csv drippers.csv
+    python -m catalog.catalog_import supplier.json --db catalog/components.db
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from catalog.Database import Database, parse_flow_rates
+
+REAL_COLUMNS = {
+    "nominal_diameter_mm", "wall_thickness_mm", "internal_diameter_mm",
+    "exponent_x", "min_pressure_bar", "max_pressure_bar",
+    "k_value_small", "k_value_large",
+}
+OPTIONAL_COLUMNS = {"notes", "description"}
+
+def _check_component(table, row):
+    """Engineering sanity checks - returns the reason a row is rejected, or None"""
+    if table == "pipes":
+        if row["nominal_diameter_mm"] <= 0 or row["internal_diameter_mm"] <= 0:
+            return "diameters must be positive"
+        if row["wall_thickness_mm"] < 0:
+            return "wall thickness cannot be negative"
+        if row["internal_diameter_mm"] > row["nominal_diameter_mm"]:
+            return "internal diameter is larger than nominal diameter"
+    elif table == "drippers":
+        if not 0 <= row["exponent_x"] <= 1:
+            return "exponent_x must be between 0 and 1"
+        if row["min_pressure_bar"] < 0 or row["max_pressure_bar"] < row["min_pressure_bar"]:
+            return "invalid pressure range"
+        if not parse_flow_rates(row["flow_rates"]):
+            return "flow_rates has no flow value"
+    elif table == "fittings":
+        if row["k_value_small"] < 0 or row["k_value_large"] < 0:
+            return "K values cannot be negative"
+    return None
+
+def validate_row(table, raw):
+    """Converts one raw record (dict) into a row tuple. Returns (row, None) or (None, reason)."""
+    row = {}
+    for column in Database.COMPONENT_COLUMNS[table]:
+        value = raw.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            if column in OPTIONAL_COLUMNS:
+                row[column] = ""
+                continue
+            return None, f"missing {column}"
+        if column in REAL_COLUMNS:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None, f"{column} is not a number: {value!r}"
+        else:
+            value = str(value)
+        row[column] = value
+
+    reason = _check_component(table, row)
+    if reason:
+        return None, reason
+    return tuple(row[c] for c in Database.COMPONENT_COLUMNS[table]), None
+
+def read_records(path, table=None):
+    """
+    Reads {table: [records]} from a file. A JSON file may hold an object keyed by
+    table name, or a list of records for the given table. A CSV file holds one table,
+    named by the table argument or by the file name (e.g. pipes.csv).
+    """
+    if path.lower().endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return data
+        if table is None:
+            raise ValueError(f"{path}: a JSON list needs an explicit table")
+        return {table: data}
+
+    if table is None:
+        table = os.path.splitext(os.path.basename(path))[0].lower()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return {table: list(csv.DictReader(f))}
+
+def import_catalog(paths, db_path="catalog/components.db", table=None):
+    """
+    Validates every record of every file and writes all valid rows in one transaction.
+    Returns a report: {table: {"inserted", "updated"}} plus "rejected" - a list of
+    (file, record number, reason).
+    """
+    components = {}
+    rejected = []
+    for path in paths:
+        for table_name, records in read_records(path, table).items():
+            if table_name not in Database.COMPONENT_COLUMNS:
+                raise ValueError(f"{path}: unknown component table '{table_name}'")
+            rows = components.setdefault(table_name, [])
+            for number, raw in enumerate(records, start=1):
+                row, reason = validate_row(table_name, raw)
+                if row is None:
+                    rejected.append((path, number, reason))
+                else:
+                    rows.append(row)
+
+    with Database(db_path) as db:
+        counts = db.bulk_upsert(components)
+
+    report = {name: {"inserted": inserted, "updated": updated} for name, (inserted, updated) in counts.items()}
+    report["rejected"] = rejected
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import of component catalogs (CSV / JSON)")
+    parser.add_argument("files", nargs="+", help="CSV or JSON catalog files")
+    parser.add_argument("--table", choices=sorted(Database.COMPONENT_COLUMNS), help="table for CSV files / JSON lists")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components.db"))
+    args = parser.parse_args(argv)
+
+    try:
+        report = import_catalog(args.files, args.db, args.table)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+
+    for name in Database.COMPONENT_COLUMNS:
+        if name in report:
+            print(f"{name}: {report[name]['inserted']} inserted, {report[name]['updated']} updated")
+    for path, number, reason in report["rejected"]:
+        print(f"Rejected {path} record {number}: {reason}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,11 @@
 import sys
 import os
+from datetime import datetime
+
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QPushButton, QLabel, QMessageBox, QDialog
 )
-from PySide6.QtCore import Qt, QUrl
+from PySide6.QtCore import Qt, QUrl, QTimer
 from PySide6.QtGui import QDesktopServices
 
 # Adjust imports based on your folder structure
@@ -68,13 +70,39 @@ class MainWindow(QMainWindow):
         self.about_window = None
         self.new_project_window = None
 
+        # פרויקטים חדשים שנשמרו רק אוטומטית (למשל אחרי קריסה) מוצעים לשחזור אחרי שהחלון עולה
+        QTimer.singleShot(0, self.offer_autosave_recovery)
+
     def open_new_project(self):
         """Open New Project window (Empty)"""
         self.new_project_window = NewProjectWindow(self)
         self.new_project_window.show()
 
+    def offer_autosave_recovery(self):
+        for autosave in self.file_manager.list_autosaves():
+            modified = datetime.fromtimestamp(autosave["mtime"]).strftime("%Y-%m-%d %H:%M")
+            answer = QMessageBox.question(
+                self, "Recover Project",
+                f"An unsaved project was autosaved on {modified}.\nDo you want to recover it?",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+            if answer == QMessageBox.Cancel:
+                return
+            if answer == QMessageBox.No:
+                self.file_manager.discard_autosave(autosave["name"])
+                continue
+            data = self.file_manager.load_autosave(autosave["name"])
+            if data is None:
+                QMessageBox.critical(self, "Error", "Failed to load the autosaved project.")
+                continue
+            self.new_project_window = NewProjectWindow(self)
+            # החלון ממשיך לכתוב לאותו קובץ שמירה אוטומטית
+            self.new_project_window.autosave_name = autosave["name"]
+            self.new_project_window.populate_from_data(data)
+            self.new_project_window.setWindowTitle("Recovered Project")
+            self.new_project_window.show()
+
     def open_saved_projects(self):
-        projects = self.file_manager.get_existing_projects()
+        projects = self.file_manager.get_project_index()
         
         if not projects:
             QMessageBox.information(self, "No Projects", "No saved projects found.")
@@ -84,9 +112,20 @@ class MainWindow(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             selected_name = dialog.get_selected_project()
             if selected_name:
-                data = self.file_manager.load_project(selected_name)
+                data = self.file_manager.open_project(selected_name)
+                autosaved = self.file_manager.newer_autosave(selected_name) if data else None
+                if autosaved is not None:
+                    answer = QMessageBox.question(
+                        self, "Recover Changes",
+                        f"'{selected_name}' has autosaved changes that are newer than the saved file.\n"
+                        "Do you want to restore them?")
+                    if answer == QMessageBox.Yes:
+                        data = autosaved
+                    else:
+                        self.file_manager.discard_autosave(selected_name)
                 if data:
                     self.new_project_window = NewProjectWindow(self)
+                    self.new_project_window.project_name = selected_name
                     self.new_project_window.populate_from_data(data)
                     self.new_project_window.setWindowTitle(f"Project: {selected_name}")
                     self.new_project_window.show()
@@ -1,12 +1,14 @@
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QLabel, QDoubleSpinBox, QSpinBox, 
     QPushButton, QRadioButton, QButtonGroup, QGroupBox, QScrollArea,
     QMessageBox, QDialog
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from main.results_window import ResultsWindow
 
 from projects.dialogs import SaveProjectDialog
@@ -47,6 +49,28 @@ class NewProjectWindow(QMainWindow):
         self.water_inputs_widgets = [] 
         self.realtime_enabled = False 
 
+        # שמירה אוטומטית: נכתבת רק אחרי שהעריכה נרגעת, ובתהליכון רקע יחיד כדי לא לחסום את הממשק
+        self.project_name = None
+        # כל חלון שלא נשמר כותב לקובץ שמירה אוטומטית משלו - שני פרויקטים חדשים לא דורסים זה את זה
+        self.autosave_name = self.file_manager.new_autosave_name()
+        self.AUTOSAVE_DELAY_MS = 2000
+        self.autosave_enabled = True
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(self.AUTOSAVE_DELAY_MS)
+        self.autosave_timer.timeout.connect(self.autosave_now)
+        self.autosave_executor = ThreadPoolExecutor(max_workers=1)
+
+        # חישוב בזמן אמת: רצף שינויים מאוחד לחישוב אחד, אחרי RECALC_DELAY_MS ללא שינוי,
+        # ולכל היותר כל RECALC_MAX_WAIT_MS גם כשהשינויים לא נעצרים (למשל לחיצה ממושכת על חץ)
+        self.RECALC_DELAY_MS = 150
+        self.RECALC_MAX_WAIT_MS = 500
+        self.recalc_timer = QTimer(self)
+        self.recalc_timer.setSingleShot(True)
+        self.recalc_timer.timeout.connect(self.recalculate_now)
+        self.recalc_pending_since = None
+        self.recalc_stats = {"requested": 0, "calculated": 0, "coalesced": 0}
+
         self.scroll = QScrollArea(self)
         self.scroll.setGeometry(0, 0, 800, 700)
         self.scroll.setWidgetResizable(False) 
@@ -272,12 +296,37 @@ class NewProjectWindow(QMainWindow):
             self.results_window = ResultsWindow(self)
         self.results_window.show()
         self.results_window.raise_()
-        self.perform_calculation_logic()
+        self.recalculate_now()
 
     def auto_refresh_calculation(self):
         if self.realtime_enabled:
             if self.results_window and self.results_window.isVisible():
-                self.perform_calculation_logic()
+                self.schedule_recalculation()
+
+    def schedule_recalculation(self):
+        """
+        Requests a recalculation; a burst of requests runs one calculation with the
+        inputs as they are when the timer fires. recalc_stats counts the requests,
+        the calculations and the requests merged into a later calculation.
+        """
+        self.recalc_stats["requested"] += 1
+        if self.recalc_timer.isActive():
+            self.recalc_stats["coalesced"] += 1
+            # עוד שינוי - דוחים את החישוב, אבל לא מעבר לזמן ההמתנה המרבי
+            waited_ms = (time.monotonic() - self.recalc_pending_since) * 1000
+            remaining_ms = self.RECALC_MAX_WAIT_MS - waited_ms
+            if remaining_ms > self.RECALC_DELAY_MS:
+                self.recalc_timer.start(self.RECALC_DELAY_MS)
+            return
+        self.recalc_pending_since = time.monotonic()
+        self.recalc_timer.start(min(self.RECALC_DELAY_MS, self.RECALC_MAX_WAIT_MS))
+
+    def recalculate_now(self):
+        # חישוב מיידי מבטל חישוב שממתין - הוא ממילא קורא את הקלט העדכני
+        self.recalc_timer.stop()
+        self.recalc_pending_since = None
+        self.recalc_stats["calculated"] += 1
+        self.perform_calculation_logic()
 
     def on_outlet_type_changed(self):
         if self.no_outlets_radio.isChecked():
@@ -353,8 +402,27 @@ class NewProjectWindow(QMainWindow):
         if length > 0:
              text += f" ({total_flow/length:.2f} L/m avg)"
         self.summary_label.setText(text)
+        # כל שינוי בקלט עובר כאן - כל עריכה נוספת דוחה את השמירה האוטומטית מחדש
+        self.schedule_autosave()
 
-    def save_project(self):
+    def schedule_autosave(self):
+        if self.autosave_enabled:
+            self.autosave_timer.start()
+
+    def autosave_now(self):
+        # איסוף הנתונים מהווידג'טים חייב לרוץ בתהליכון הממשק; הסריאליזציה והכתיבה ברקע
+        data = self.collect_project_data()
+        self.autosave_executor.submit(self.file_manager.autosave_project, self.project_name or self.autosave_name, data)
+
+    def closeEvent(self, event):
+        self.recalc_timer.stop()
+        # שמירה אוטומטית שעדיין ממתינה לטיימר נשלחת מיד; הכתיבה עצמה תסתיים ברקע
+        if self.autosave_timer.isActive():
+            self.autosave_timer.stop()
+            self.autosave_now()
+        super().closeEvent(event)
+
+    def collect_project_data(self):
         data = {
             "length": self.length_spinbox.value(),
             "connectors": {
@@ -382,16 +450,27 @@ class NewProjectWindow(QMainWindow):
                     pass
             data["planter_flows"] = flows
             data["direct_soil_drippers"] = {}
+        return data
+
+    def save_project(self):
+        data = self.collect_project_data()
 
-        dialog = SaveProjectDialog(self)
+        dialog = SaveProjectDialog(self, self.file_manager.save_format)
         if dialog.exec() == QDialog.Accepted:
             name = dialog.get_project_name()
             if not name:
                 QMessageBox.warning(self, "Warning", "Project name cannot be empty.")
                 return
             
-            success, msg = self.file_manager.save_project(name, data)
+            # השמירות האוטומטיות ממשיכות באותו פורמט שנבחר
+            self.file_manager.save_format = dialog.get_save_format()
+            success, msg = self.file_manager.save_project(name, data, self.file_manager.save_format)
             if success:
+                # העותקים האוטומטיים התיישנו; המחיקה נכנסת לתור אחרי כתיבות שכבר ממתינות
+                self.autosave_timer.stop()
+                for stale in (self.project_name or self.autosave_name, name):
+                    self.autosave_executor.submit(self.file_manager.discard_autosave, stale)
+                self.project_name = name
                 QMessageBox.information(self, "Success", msg)
             else:
                 QMessageBox.critical(self, "Error", f"Failed to save: {msg}")
@@ -420,10 +499,10 @@ class NewProjectWindow(QMainWindow):
                 num_outlets = data.get("num_outlets", 5)
                 self.outlets_spinbox.setValue(num_outlets)
                 self._rebuild_planters_ui() 
+                # הספיקות עשויות להיקרא מהקובץ תוך כדי מעבר (open_project) - בלי גישה לפי אינדקס
                 saved_flows = data.get("planter_flows", [])
-                for i, (_, spinbox) in enumerate(self.water_inputs):
-                    if i < len(saved_flows):
-                        spinbox.setValue(saved_flows[i])
+                for (_, spinbox), flow in zip(self.water_inputs, saved_flows):
+                    spinbox.setValue(flow)
 
         finally:
             self.length_spinbox.blockSignals(False)
@@ -460,4 +539,4 @@ class NewProjectWindow(QMainWindow):
             input_data['specific_flows'] = specific_flows
 
         if self.results_window:
-            self.results_window.perform_calculation(input_data)
\ No newline at end of file
+            self.results_window.perform_calculation(input_data, project_name=self.project_name)
\ No newline at end of file
@@ -1,10 +1,9 @@
 import sys
 import os
-import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from fpdf import FPDF
-
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.dirname(current_dir)
 if root_dir not in sys.path:
@@ -24,32 +23,8 @@ from matplotlib.figure import Figure
 
 # ייבוא ישיר ודטרמיניסטי של מנוע החישוב
 from calculations.calculation_engine import IrrigationCalculator
-
-class PDFReport(FPDF):
-    def header(self):
-        self.set_font('Helvetica', 'B', 15)
-        self.set_text_color(44, 95, 45)
-        self.cell(0, 10, 'Irrigation System Design Report', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Helvetica', 'I', 8)
-        self.set_text_color(128)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-    def chapter_title(self, label):
-        self.set_font('Helvetica', 'B', 12)
-        self.set_fill_color(240, 248, 240) 
-        self.set_text_color(44, 95, 45)
-        self.cell(0, 8, f"  {label}", 0, 1, 'L', fill=True)
-        self.ln(2)
-
-    def chapter_body(self, body):
-        self.set_font('Helvetica', '', 10)
-        self.set_text_color(0)
-        self.multi_cell(0, 6, body)
-        self.ln()
+from projects.file_manager import ProjectFileManager
+from projects.reports import plot_pressure_profile, write_csv_report, write_pdf_report
 
 class MplCanvas(FigureCanvasQTAgg):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -67,9 +42,17 @@ class ResultsWindow(QMainWindow):
         
         # יצירת מופע של המנוע ישירות
         self.calculator = IrrigationCalculator()
+        # מטמון התוצאות של פרויקטים שמורים: נקרא מהדיסק פעם אחת לכל פרויקט ונשמר בזיכרון;
+        # הכתיבה לקובץ ברקע, בתהליכון יחיד, וכתיבות שמצטברות בזמן שהוא עסוק מתאחדות לאחת
+        self.file_manager = ProjectFileManager(root_dir)
+        self.results_memo = {}
+        self.results_lock = threading.Lock()
+        self.results_write_pending = set()
+        self.results_executor = ThreadPoolExecutor(max_workers=1)
             
         self.last_results = None
         self.last_inputs = None
+        self.last_results_cached = False
 
         self.scroll = QScrollArea(self)
         self.scroll.setGeometry(0, 0, 700, 700)
@@ -178,7 +161,11 @@ class ResultsWindow(QMainWindow):
         
         self.container.setFixedSize(680, y)
 
-    def perform_calculation(self, input_data):
+    def perform_calculation(self, input_data, project_name=None):
+        """
+        For a saved project (project_name), results cached next to it for the same inputs
+        and catalog are shown without recomputing; new results are added to that cache.
+        """
         self.last_inputs = input_data
         
         length = input_data.get('length', 10)
@@ -186,13 +173,19 @@ class ResultsWindow(QMainWindow):
         connectors = input_data.get('connectors', {})
         
         try:
-            if mode == 'continuous':
+            res = None
+            if project_name:
+                cache_key = self.file_manager.results_key(input_data, self.calculator.catalog_version())
+                res = self._project_results(project_name).get(cache_key)
+            self.last_results_cached = res is not None
+
+            if res is None and mode == 'continuous':
                 res = self.calculator.calculate_continuous_soil(
                     length_m=length,
                     total_flow_lh=input_data.get('total_flow_lh', 0.0),
                     connectors=connectors
                 )
-            else:
+            elif res is None:
                 specific_flows = input_data.get('specific_flows', [])
                 res = self.calculator.calculate_planters_scenario(
                     length_m=length,
@@ -200,6 +193,8 @@ class ResultsWindow(QMainWindow):
                     specific_flows_list=specific_flows,
                     connectors=connectors
                 )
+            if project_name and not self.last_results_cached:
+                self.remember_results(project_name, cache_key, res)
             
             self.last_results = res
             
@@ -214,6 +209,32 @@ class ResultsWindow(QMainWindow):
             import traceback
             traceback.print_exc()
 
+    def _project_results(self, project_name):
+        with self.results_lock:
+            if project_name not in self.results_memo:
+                self.results_memo[project_name] = self.file_manager.load_results_cache(project_name)
+            return self.results_memo[project_name]
+
+    def remember_results(self, project_name, cache_key, res):
+        """Adds res to the in-memory cache of project_name and schedules writing it to disk"""
+        with self.results_lock:
+            entries = self.results_memo.setdefault(project_name, {})
+            entries.pop(cache_key, None)
+            entries[cache_key] = res
+            while len(entries) > self.file_manager.RESULTS_CACHE_ENTRIES:
+                entries.pop(next(iter(entries)))
+            if project_name in self.results_write_pending:
+                return  # כתיבה כבר ממתינה בתור - היא תכלול גם את התוצאה הזו
+            self.results_write_pending.add(project_name)
+        self.results_executor.submit(self._write_results_cache, project_name)
+
+    def _write_results_cache(self, project_name):
+        # רץ בתהליכון הרקע: מעתיקים את המצב העדכני ברגע הכתיבה
+        with self.results_lock:
+            self.results_write_pending.discard(project_name)
+            entries = dict(self.results_memo.get(project_name, {}))
+        self.file_manager.save_results_cache(project_name, entries)
+
     def update_report(self, res, mode):
         html = f"""<h3>✅ Results</h3>
         <p><b>Range:</b> {res.get('range_classification')}</p>
@@ -245,20 +266,7 @@ class ResultsWindow(QMainWindow):
         self.results_label.adjustSize()
 
     def update_graph(self, graph_data):
-        x = graph_data['x']
-        y = graph_data['y']
-        self.canvas.axes.cla()
-        self.canvas.axes.plot(x, y, 'o-', color='#2196F3')
-        self.canvas.axes.axhline(y=1.0, color='red', linestyle='--')
-        
-        if y:
-            min_y, max_y = min(y), max(y)
-            margin = (max_y - min_y) * 0.1 if max_y != min_y else 0.5
-            self.canvas.axes.set_ylim(min_y - margin, max_y + margin)
-            
-        self.canvas.axes.set_xlabel("Distance (m)")
-        self.canvas.axes.set_ylabel("Pressure (Bar)")
-        self.canvas.axes.grid(True, alpha=0.5)
+        plot_pressure_profile(self.canvas.axes, graph_data)
         self.canvas.draw()
 
     def export_csv(self):
@@ -273,45 +281,7 @@ class ResultsWindow(QMainWindow):
             return
 
         try:
-            res = self.last_results
-            inp = self.last_inputs
-            connectors = inp.get('connectors', {})
-            mode = inp.get('mode', 'continuous')
-            
-            pipe_size = res.get('recommended_pipe_mm') if mode == 'continuous' else res.get('recommended_main_pipe_mm')
-
-            with open(file_path, mode='w', newline='', encoding='utf-8-sig') as file:
-                writer = csv.writer(file)
-                writer.writerow(["IRRIGATION SYSTEM CALCULATION REPORT"])
-                writer.writerow(["Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-                writer.writerow([])
-                writer.writerow(["BILL OF MATERIALS (BOM)"])
-                writer.writerow(["Item", "Quantity/Value", "Unit"])
-                writer.writerow(["Main Pipe Diameter", pipe_size, "mm"])
-                writer.writerow(["Total Length", inp.get('length'), "m"])
-                
-                if mode == 'planters':
-                    writer.writerow(["Spaghetti Pipe", "As needed (per planter)", ""])
-                    writer.writerow(["Number of Planters", inp.get('num_outlets'), "units"])
-                
-                writer.writerow(["Total System Flow", res.get('total_flow_lh'), "L/h"])
-                writer.writerow(["Required Inlet Pressure", res.get('required_inlet_pressure_bar'), "Bar"])
-                
-                writer.writerow([])
-                writer.writerow(["CONNECTORS LIST"])
-                writer.writerow(["Elbows (90 deg)", connectors.get('elbows', 0), "units"])
-                writer.writerow(["T-Connectors", connectors.get('tees', 0), "units"])
-                writer.writerow(["Straight Connectors", connectors.get('straights', 0), "units"])
-                
-                writer.writerow([])
-                writer.writerow(["HYDRAULIC DATA - PRESSURE DISTRIBUTION"])
-                writer.writerow(["Distance from Source (m)", "Pressure (Bar)"])
-                
-                distances = res.get('graph_data', {}).get('x', [])
-                pressures = res.get('graph_data', {}).get('y', [])
-                
-                for d, p in zip(distances, pressures):
-                    writer.writerow([f"{d:.2f}", f"{p:.3f}"])
+            write_csv_report(file_path, self.last_inputs, self.last_results)
             
             QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
             
@@ -330,74 +300,8 @@ class ResultsWindow(QMainWindow):
             return
 
         try:
-            temp_img = os.path.join(root_dir, "temp_graph.png")
-            self.canvas.figure.savefig(temp_img, dpi=150, bbox_inches='tight')
-
-            pdf = PDFReport()
-            pdf.add_page()
-            
-            res = self.last_results
-            inp = self.last_inputs
-            connectors = inp.get('connectors', {})
-            mode = inp.get('mode', 'continuous')
-            
-            pdf.chapter_title("Project Overview")
-            date_str = datetime.now().strftime("%d/%m/%Y %H:%M")
-            info_text = (f"Date: {date_str}\n"
-                         f"Garden Length: {inp.get('length')} m\n"
-                         f"Irrigation Mode: {mode.replace('_', ' ').title()}\n"
-                         f"Total Flow: {res.get('total_flow_lh')} L/h")
-            pdf.chapter_body(info_text)
-
-            pdf.chapter_title("System Recommendations")
-            
-            pipe_size = res.get('recommended_pipe_mm') if mode == 'continuous' else res.get('recommended_main_pipe_mm')
-            
-            rec_text = (f"Main Pipe Diameter: {pipe_size} mm\n"
-                        f"Required Inlet Pressure: {res.get('required_inlet_pressure_bar')} Bar\n")
-            
-            if mode == 'planters':
-                 rec_text += f"Secondary Pipe (Spaghetti): {res.get('recommended_planter_pipe')}\n"
-                 
-            pdf.chapter_body(rec_text)
-
-            pdf.chapter_title("Bill of Materials (BOM)")
-            
-            pdf.set_font('Helvetica', 'B', 10)
-            pdf.set_fill_color(200, 200, 200)
-            pdf.cell(100, 7, "Item", 1, 0, 'L', fill=True)
-            pdf.cell(40, 7, "Quantity", 1, 1, 'C', fill=True)
-            
-            pdf.set_font('Helvetica', '', 10)
-            
-            items = [
-                (f"Main Pipe ({pipe_size}mm)", f"{inp.get('length')} m"),
-                ("Elbow Connectors (90)", str(connectors.get('elbows', 0))),
-                ("T-Connectors", str(connectors.get('tees', 0))),
-                ("Straight Connectors", str(connectors.get('straights', 0))),
-            ]
-            
-            if mode == 'planters':
-                 items.append(("Drippers / Outlets", str(inp.get('num_outlets'))))
-            
-            for name, qty in items:
-                pdf.cell(100, 7, name, 1, 0, 'L')
-                pdf.cell(40, 7, qty, 1, 1, 'C')
-            
-            pdf.ln(5)
-
-            pdf.chapter_title("Hydraulic Analysis Graph")
-            pdf.image(temp_img, x=15, w=180)
-
-            pdf.output(file_path)
-            
-            if os.path.exists(temp_img):
-                os.remove(temp_img)
-                
+            write_pdf_report(file_path, self.last_inputs, self.last_results, figure=self.canvas.figure)
             QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
 
         except Exception as e:
-            QMessageBox.critical(self, "PDF Export Error", f"Failed to generate PDF:\n{str(e)}")
-            if os.path.exists("temp_graph.png"):
-                try: os.remove("temp_graph.png")
-                except: pass
\ No newline at end of file
+            QMessageBox.critical(self, "PDF Export Error", f"Failed to generate PDF:\n{str(e)}")
\ No newline at end of file
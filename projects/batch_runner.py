@@ -0,0 +1,173 @@
+"""
+Batch Runner Module
+Headless re-calculation of saved projects across a process pool (no Qt required)
+
+Usage:
+    python -m projects.batch_runner
+    python -m projects.batch_runner "customers/*.json" --summary summary.csv --csv --pdf
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from calculations.calculation_engine import IrrigationCalculator
+from catalog.catalog_cache import create_snapshot, install_snapshot
+from projects.file_manager import ProjectFileManager
+from projects.project_stream import open_project_file
+
+SUMMARY_COLUMNS = ("name", "mode", "pipe_mm", "total_flow_lh", "required_inlet_pressure_bar", "error", "file")
+
+def calculation_inputs(data):
+    """
+    Converts saved project data into the inputs the results window calculates from.
+    data may be lazy (open_project_file): only the flows the calculation needs are read.
+    """
+    conns = data.get("connectors", {})
+    inputs = {
+        'length': data.get("length", 10.0),
+        'connectors': {
+            'elbows': conns.get("elbow", 0),
+            'tees': conns.get("t", 0),
+            'straights': conns.get("straight", 0)
+        }
+    }
+    if data.get("mode", "planters") == "direct_soil":
+        inputs['mode'] = 'continuous'
+        # המפתח הוא ספיקת הטפטפת והערך הוא הכמות
+        inputs['total_flow_lh'] = sum(float(flow) * qty for flow, qty in data.get("direct_soil_drippers", {}).items())
+    else:
+        inputs['mode'] = 'planters'
+        inputs['num_outlets'] = data.get("num_outlets", len(data.get("planter_flows", [])))
+        inputs['specific_flows'] = list(data.get("planter_flows", []))
+    return inputs
+
+def run_calculation(calculator, inputs):
+    """Runs the calculation of the inputs built by calculation_inputs"""
+    if inputs['mode'] == 'continuous':
+        return calculator.calculate_continuous_soil(
+            length_m=inputs['length'],
+            total_flow_lh=inputs['total_flow_lh'],
+            connectors=inputs['connectors']
+        )
+    return calculator.calculate_planters_scenario(
+        length_m=inputs['length'],
+        num_planters=inputs['num_outlets'],
+        specific_flows_list=inputs['specific_flows'],
+        connectors=inputs['connectors']
+    )
+
+# מחשבון אחד לכל תהליך עובד, עם הקטלוג שנטען מתמונת המצב
+_worker_calculator = None
+
+def _init_worker(db_path, snapshot):
+    global _worker_calculator
+    install_snapshot(db_path, snapshot)
+    _worker_calculator = IrrigationCalculator(db_path)
+
+def _run_project(path, export_dir=None, export_csv=False, export_pdf=False):
+    """Calculates one project file and returns its summary row (errors are reported in the row)"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    row = dict.fromkeys(SUMMARY_COLUMNS, "")
+    row.update(name=name, file=path)
+    try:
+        inputs = calculation_inputs(open_project_file(path))
+        res = run_calculation(_worker_calculator, inputs)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+
+    row.update(mode=inputs['mode'],
+               pipe_mm=res.get('recommended_pipe_mm', res.get('recommended_main_pipe_mm')),
+               total_flow_lh=res.get('total_flow_lh'),
+               required_inlet_pressure_bar=res.get('required_inlet_pressure_bar'))
+
+    if export_csv or export_pdf:
+        try:
+            # דוחות נטענים רק כשמבקשים אותם (fpdf ו-matplotlib)
+            from projects.reports import write_csv_report, write_pdf_report
+            if export_csv:
+                write_csv_report(os.path.join(export_dir, name + ".csv"), inputs, res)
+            if export_pdf:
+                write_pdf_report(os.path.join(export_dir, name + ".pdf"), inputs, res)
+        except Exception as e:
+            row["error"] = f"Report failed - {type(e).__name__}: {e}"
+    return row
+
+def find_projects(patterns=None, saves_dir=None):
+    """Project files matching the glob patterns (every saved project if no pattern is given)"""
+    extensions = tuple(ProjectFileManager.EXTENSIONS.values())
+    if not patterns:
+        saves_dir = saves_dir or 'projects/saves'
+        patterns = [os.path.join(saves_dir, "*" + ext) for ext in extensions]
+
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        paths.extend(sorted(p for p in matches if os.path.isfile(p)))
+    return list(dict.fromkeys(paths))
+
+def run_batch(paths, db_path=None, max_workers=None, export_dir=None, export_csv=False, export_pdf=False):
+    """Calculates every project in paths across a process pool; returns the summary rows in input order"""
+    if not paths:
+        return []
+    export_dir = export_dir or "."
+    if export_csv or export_pdf:
+        os.makedirs(export_dir, exist_ok=True)
+    db_path = db_path or IrrigationCalculator().db_path
+    snapshot = create_snapshot(db_path)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(paths)))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(db_path, snapshot)) as executor:
+        run = partial(_run_project, export_dir=export_dir, export_csv=export_csv, export_pdf=export_pdf)
+        # כמה פרויקטים לכל משימה - פחות תקשורת בין התהליכים כשיש מאות פרויקטים
+        chunk = max(1, len(paths) // (max_workers * 4))
+        return list(executor.map(run, paths, chunksize=chunk))
+
+def write_summary(file_path, rows):
+    with open(file_path, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-calculate saved irrigation projects without the GUI")
+    parser.add_argument("projects", nargs="*", help="project files or glob patterns (default: every project in projects/saves)")
+    parser.add_argument("--saves-dir", default="projects/saves")
+    parser.add_argument("--summary", default="batch_summary.csv", help="summary table (CSV)")
+    parser.add_argument("--csv", action="store_true", help="also write a CSV report per project")
+    parser.add_argument("--pdf", action="store_true", help="also write a PDF report per project")
+    parser.add_argument("--output-dir", default="batch_reports", help="directory of the per-project reports")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--db", help="component database (default: catalog/components.db)")
+    args = parser.parse_args(argv)
+
+    paths = find_projects(args.projects, args.saves_dir)
+    if not paths:
+        print("No projects found.", file=sys.stderr)
+        return 1
+
+    try:
+        rows = run_batch(paths, args.db, args.workers, args.output_dir, args.csv, args.pdf)
+        write_summary(args.summary, rows)
+    except (OSError, ValueError) as e:
+        print(f"Batch run failed: {e}", file=sys.stderr)
+        return 1
+
+    for row in rows:
+        if row["error"]:
+            print(f"{row['name']}: {row['error']}")
+        else:
+            print(f"{row['name']}: {row['mode']}, pipe {row['pipe_mm']} mm, "
+                  f"{row['total_flow_lh']} L/h, inlet {row['required_inlet_pressure_bar']} bar")
+    failed = sum(1 for row in rows if row["error"])
+    print(f"{len(rows)} projects, {failed} failed - summary written to {args.summary}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
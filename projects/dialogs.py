@@ -1,14 +1,22 @@
+from datetime import datetime
+
+from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (
     QDialog, QLabel, QLineEdit, QDialogButtonBox, 
-    QListWidget, QPushButton, QMessageBox
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+    QPushButton, QMessageBox, QComboBox
 )
 
+from projects.file_manager import FORMAT_JSON, FORMAT_BINARY, ProjectFileManager
+
 class SaveProjectDialog(QDialog):
-    def __init__(self, parent=None):
+    FORMATS = [("JSON (.json)", FORMAT_JSON), ("Compact binary (.irp) - for large projects", FORMAT_BINARY)]
+
+    def __init__(self, parent=None, save_format=FORMAT_JSON):
         super().__init__(parent)
         self.setWindowTitle("Save Project")
         # גודל חלון קבוע
-        self.setFixedSize(400, 150)
+        self.setFixedSize(400, 190)
         
         # כותרת
         lbl = QLabel("Enter Project Name:", self)
@@ -19,49 +27,110 @@ class SaveProjectDialog(QDialog):
         self.name_input = QLineEdit(self)
         self.name_input.setPlaceholderText("e.g., Garden_Front_Yard")
         self.name_input.setGeometry(20, 50, 360, 30)
+        self.name_input.textChanged.connect(self._format_from_extension)
+
+        # פורמט השמירה; שם שמסתיים בסיומת ידועה בוחר את הפורמט שלה
+        format_lbl = QLabel("Format:", self)
+        format_lbl.setGeometry(20, 95, 60, 30)
+        self.format_combo = QComboBox(self)
+        for label, fmt in self.FORMATS:
+            self.format_combo.addItem(label, fmt)
+        self.format_combo.setCurrentIndex(max(self.format_combo.findData(save_format), 0))
+        self.format_combo.setGeometry(80, 95, 300, 30)
         
         # כפתורי שמירה/ביטול מובנים של Qt
         buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel, self)
         buttons.accepted.connect(self.accept)
         buttons.rejected.connect(self.reject)
-        buttons.setGeometry(20, 100, 360, 30)
+        buttons.setGeometry(20, 140, 360, 30)
+
+    def _format_from_extension(self, text):
+        for fmt, ext in ProjectFileManager.EXTENSIONS.items():
+            if text.strip().endswith(ext):
+                self.format_combo.setCurrentIndex(self.format_combo.findData(fmt))
 
     def get_project_name(self):
         return self.name_input.text().strip()
 
+    def get_save_format(self):
+        return self.format_combo.currentData()
+
 
 class LoadProjectDialog(QDialog):
+    COLUMNS = ["Name", "Mode", "Length (m)", "Outlets", "Flow (L/h)", "Modified"]
+
     def __init__(self, projects_list, parent=None):
+        """projects_list: metadata dicts from ProjectFileManager.get_project_index (or bare names)"""
         super().__init__(parent)
         self.setWindowTitle("Load Existing Project")
         # גודל חלון קבוע
-        self.setFixedSize(400, 500)
+        self.setFixedSize(640, 500)
         
         # כותרת
         lbl = QLabel("Select a Project to Load:", self)
         lbl.setStyleSheet("font-weight: bold; font-size: 14px;")
-        lbl.setGeometry(20, 20, 360, 20)
+        lbl.setGeometry(20, 20, 600, 20)
         
-        # רשימת הפרויקטים לבחירה
-        self.list_widget = QListWidget(self)
-        self.list_widget.addItems(projects_list)
-        # גובה 380, כדי שיישאר בדיוק מקום לכפתור למטה
-        self.list_widget.setGeometry(20, 50, 360, 380) 
+        # חיפוש לפי שם או מצב - מסתיר שורות בלי לבנות את הטבלה מחדש
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Search projects...")
+        self.search_input.setGeometry(20, 50, 600, 30)
+        self.search_input.textChanged.connect(self.filter_projects)
+        
+        # טבלת הפרויקטים לבחירה - לחיצה על כותרת עמודה ממיינת לפיה
+        self.table = QTableWidget(len(projects_list), len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.doubleClicked.connect(lambda _index: self.validate_selection())
+        for row, project in enumerate(projects_list):
+            if isinstance(project, str):
+                project = {"name": project}
+            mtime = project.get("mtime")
+            values = [
+                project["name"],
+                {"planters": "Planters", "direct_soil": "Direct Soil"}.get(project.get("mode"), ""),
+                project.get("length"),
+                project.get("num_outlets"),
+                project.get("total_flow_lh"),
+                datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M") if mtime else "",
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem()
+                # מספרים נשמרים כמספרים כדי שהמיון יהיה מספרי ולא לפי טקסט
+                item.setData(Qt.DisplayRole, value if value is not None else "")
+                self.table.setItem(row, col, item)
+        # המיון מופעל רק אחרי המילוי - אחרת הטבלה ממוינת מחדש אחרי כל תא
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(5, Qt.DescendingOrder)
+        # גובה 340, כדי שיישאר בדיוק מקום לכפתור למטה
+        self.table.setGeometry(20, 90, 600, 340)
         
         # כפתור טעינה
         load_btn = QPushButton("Load Selected Project", self)
         load_btn.setStyleSheet("background-color: #2196F3; color: white; font-weight: bold; padding: 10px; border-radius: 4px;")
         load_btn.clicked.connect(self.validate_selection)
-        load_btn.setGeometry(20, 440, 360, 40)
+        load_btn.setGeometry(20, 440, 600, 40)
+
+    def filter_projects(self, text):
+        text = text.strip().lower()
+        for row in range(self.table.rowCount()):
+            name = self.table.item(row, 0).text().lower()
+            mode = self.table.item(row, 1).text().lower()
+            self.table.setRowHidden(row, bool(text) and text not in name and text not in mode)
 
     def validate_selection(self):
-        if not self.list_widget.currentItem():
+        row = self.table.currentRow()
+        if row < 0 or self.table.isRowHidden(row):
             QMessageBox.warning(self, "No Selection", "Please select a project from the list.")
             return
         self.accept()
 
     def get_selected_project(self):
-        current_item = self.list_widget.currentItem()
-        if current_item:
-            return current_item.text()
-        return None
\ No newline at end of file
+        row = self.table.currentRow()
+        if row >= 0:
+            return self.table.item(row, 0).text()
+        return None
@@ -1,53 +1,397 @@
 import os
 import json
+import hashlib
+import tempfile
+import time
+import uuid
+
+from projects import project_codec
+from projects.project_history import ProjectHistory
+from projects.project_stream import open_project_file
+
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+
+# ה-umask של התהליך נקרא פעם אחת (os.umask משנה אותו, ולכן לא קוראים לו מתהליכוני רקע)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def load_project_file(filepath):
+    """Reads a project file of either format (detected from its content, not its extension)"""
+    with open(filepath, 'rb') as f:
+        payload = f.read()
+    if project_codec.is_binary(payload):
+        return project_codec.decode(payload)
+    return json.loads(payload.decode('utf-8'))
 
 class ProjectFileManager:
     """
     Handles all file system operations: ensuring directories exist,
     saving data to JSON, and scanning/loading files.
+    Keeps an index of the saved projects' metadata (INDEX_FILENAME in the saves
+    directory) so they can be listed without opening every project file.
+    Every write goes to a temp file that atomically replaces the target, so a crash
+    mid-write leaves the previous version intact.
+    Projects are saved as JSON or in the compact binary format of project_codec
+    (save_format); load_project detects the format from the file content.
+    open_project reads a project lazily (project_stream), for huge saves.
     """
+    INDEX_FILENAME = '.project_index'
+    INDEX_VERSION = 1
+    AUTOSAVE_DIR = 'autosave'
+    # פרויקט שטרם נשמר מקבל שם שמירה אוטומטית ייחודי משלו
+    UNTITLED_PREFIX = 'untitled-'
+    EXTENSIONS = {FORMAT_JSON: '.json', FORMAT_BINARY: '.irp'}
+    # מטמון התוצאות נשמר ליד הפרויקט; גרסת המטמון עולה כשמשתנה מבנה התוצאות
+    RESULTS_SUFFIX = '.results'
+    RESULTS_CACHE_VERSION = 3
+    RESULTS_CACHE_ENTRIES = 8
+    HISTORY_SUFFIX = '.history'
+
     def __init__(self, root=None):
         self.projects_dir = 'projects/saves'
         if not os.path.exists(self.projects_dir):
             os.makedirs(self.projects_dir)
+        # גיבוב התוכן האחרון שנכתב לכל קובץ שמירה אוטומטית - תוכן זהה לא נכתב שוב
+        self._autosave_hashes = {}
+        # פורמט השמירה: JSON קריא, או בינארי דחוס לפרויקטים גדולים
+        self.save_format = FORMAT_JSON
+        # כל שמירה מוסיפה גרסה להיסטוריית הפרויקט (נשמר רק ההפרש מהגרסה הקודמת)
+        self.keep_history = True
+        self._histories = {}
+
+    def _strip_extension(self, name):
+        base, ext = os.path.splitext(name)
+        return base if ext in self.EXTENSIONS.values() else name
 
-    def save_project(self, name, data):
+    def save_project(self, name, data, save_format=None):
+        """Saves data as project name, in save_format, else the format of name's extension, else self.save_format"""
+        if save_format is None:
+            # "garden.irp" נשמר בפורמט הבינארי גם בלי לבחור פורמט במפורש
+            ext = os.path.splitext(name)[1]
+            save_format = next((fmt for fmt, e in self.EXTENSIONS.items() if e == ext), self.save_format)
+        if save_format not in self.EXTENSIONS:
+            return False, f"Unknown project format: {save_format}"
         # Ensure correct extension
-        if not name.endswith('.json'):
-            filename = name + '.json'
-        else:
-            filename = name
+        base = self._strip_extension(name)
+        filename = base + self.EXTENSIONS[save_format]
             
         filepath = os.path.join(self.projects_dir, filename)
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            return True, f"Project '{name}' saved successfully."
+            self._write_atomic(filepath, self._serialize(data, save_format))
         except Exception as e:
             return False, str(e)
 
+        # עדכון האינדקס נכשל? לא נורא - הוא ייבנה מחדש בסריקה הבאה
+        try:
+            index = self._read_index()
+            # עותק ישן של אותו פרויקט בפורמט האחר מוחלף בשמירה הזו
+            for ext in self.EXTENSIONS.values():
+                if base + ext != filename and os.path.exists(os.path.join(self.projects_dir, base + ext)):
+                    os.remove(os.path.join(self.projects_dir, base + ext))
+                    index.pop(base + ext, None)
+            stat = os.stat(filepath)
+            index[filename] = self._project_summary(base, data, stat)
+            self._write_index(index)
+        except OSError:
+            pass
+
+        if self.keep_history:
+            try:
+                self.history(base).append(data)
+            except (OSError, ValueError) as e:
+                print(f"Project history not updated: {e}")
+        return True, f"Project '{name}' saved successfully."
+
+    def new_autosave_name(self):
+        """Unique autosave name for a project that has not been saved yet"""
+        return f"{self.UNTITLED_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+    def _autosave_paths(self, name):
+        base = self._strip_extension(name)
+        return [os.path.join(self.projects_dir, self.AUTOSAVE_DIR, base + ext) for ext in self.EXTENSIONS.values()]
+
+    def autosave_project(self, name, data):
+        """
+        Writes data to the autosave copy of project name (AUTOSAVE_DIR in the saves directory),
+        unless it is identical to what was last autosaved there. Returns True if the file
+        was written. Safe to call from a worker thread (one writer at a time).
+        """
+        filename = self._strip_extension(name) + self.EXTENSIONS[self.save_format]
+        filepath = os.path.join(self.projects_dir, self.AUTOSAVE_DIR, filename)
+
+        payload = self._serialize(data, self.save_format)
+        digest = hashlib.sha256(payload).hexdigest()
+        if self._autosave_hashes.get(filepath) == digest:
+            return False
+
+        try:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            self._write_atomic(filepath, payload)
+        except OSError as e:
+            print(f"Autosave failed: {e}")
+            return False
+        self._autosave_hashes[filepath] = digest
+        return True
+
+    def list_autosaves(self):
+        """
+        Autosaved projects without a saved copy (new projects, e.g. after a crash),
+        newest first, as dicts of name and mtime.
+        """
+        autosaves = {}
+        autosave_dir = os.path.join(self.projects_dir, self.AUTOSAVE_DIR)
+        if os.path.isdir(autosave_dir):
+            for entry in os.scandir(autosave_dir):
+                name, ext = os.path.splitext(entry.name)
+                if ext not in self.EXTENSIONS.values() or self._project_path(name) is not None:
+                    continue
+                mtime = entry.stat().st_mtime
+                if mtime > autosaves.get(name, {"mtime": -1})["mtime"]:
+                    autosaves[name] = {"name": name, "mtime": mtime}
+        return sorted(autosaves.values(), key=lambda a: a["mtime"], reverse=True)
+
+    def load_autosave(self, name):
+        """Newest autosaved data of project name, or None"""
+        paths = [path for path in self._autosave_paths(name) if os.path.exists(path)]
+        if not paths:
+            return None
+        try:
+            return load_project_file(max(paths, key=os.path.getmtime))
+        except Exception as e:
+            print(f"Error loading autosave: {e}")
+            return None
+
+    def newer_autosave(self, name):
+        """Autosaved data of saved project name if it is newer than the saved file and differs from it, else None"""
+        filepath = self._project_path(name)
+        paths = [path for path in self._autosave_paths(name) if os.path.exists(path)]
+        if filepath is None or not paths or max(map(os.path.getmtime, paths)) <= os.path.getmtime(filepath):
+            return None
+        data = self.load_autosave(name)
+        # שמירה אוטומטית שנכתבה אחרי השמירה אך בלי שינוי - אין מה לשחזר
+        if data is None or data == self.load_project(name):
+            return None
+        return data
+
+    def discard_autosave(self, name):
+        """Deletes the autosave copies of project name"""
+        for path in self._autosave_paths(name):
+            self._autosave_hashes.pop(path, None)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Autosave not removed: {e}")
+
+    def _serialize(self, data, save_format=FORMAT_JSON):
+        if save_format == FORMAT_BINARY:
+            return project_codec.encode(data)
+        return json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+
+    def _write_atomic(self, filepath, payload):
+        """Writes payload to a temp file in the same directory and renames it over filepath"""
+        # הקובץ הזמני מתחיל בנקודה ומסתיים ב-tmp - לא יופיע ברשימת הפרויקטים
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix='.', suffix='.tmp')
+        try:
+            # mkstemp יוצר קובץ 0600 - ההרשאות נלקחות מהקובץ הקיים, או כמו open() לקובץ חדש
+            try:
+                mode = os.stat(filepath).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(temp_path, mode)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, filepath)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
     def load_project(self, name):
         # Handle cases where name might or might not have extension
-        filename = name if name.endswith('.json') else name + '.json'
-        filepath = os.path.join(self.projects_dir, filename)
+        filepath = self._project_path(name)
         
-        if not os.path.exists(filepath):
+        if filepath is None:
             return None
             
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return data
+            return load_project_file(filepath)
         except Exception as e:
             print(f"Error loading file: {e}")
             return None
 
+    def open_project(self, name):
+        """
+        Like load_project, but only the top-level values are parsed; lists (planter_flows)
+        are LazyArray objects streamed from the file when iterated.
+        """
+        filepath = self._project_path(name)
+        if filepath is None:
+            return None
+        try:
+            return open_project_file(filepath)
+        except Exception as e:
+            print(f"Error loading file: {e}")
+            return None
+
+    def history(self, name):
+        """ProjectHistory of project name (kept per manager, so the latest revision stays in memory)"""
+        base = self._strip_extension(name)
+        if base not in self._histories:
+            self._histories[base] = ProjectHistory(os.path.join(self.projects_dir, base + self.HISTORY_SUFFIX))
+        return self._histories[base]
+
+    def list_revisions(self, name):
+        """Saved revisions of project name, oldest first (see ProjectHistory.revisions)"""
+        return self.history(name).revisions()
+
+    def checkout_revision(self, name, revision):
+        """Project data of name as it was saved in revision, or None if it does not exist"""
+        try:
+            return self.history(name).checkout(revision)
+        except (OSError, ValueError) as e:
+            print(f"Error loading revision: {e}")
+            return None
+
+    def diff_revisions(self, name, revision_a, revision_b):
+        """Changes between two revisions of project name as (path, old value, new value) tuples"""
+        return self.history(name).diff(revision_a, revision_b)
+
+    def results_key(self, inputs, catalog_version):
+        """Content hash of the calculation inputs and the catalog version they were computed with"""
+        key_data = {"inputs": inputs, "catalog": catalog_version, "version": self.RESULTS_CACHE_VERSION}
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _results_path(self, name):
+        return os.path.join(self.projects_dir, self._strip_extension(name) + self.RESULTS_SUFFIX)
+
+    def load_results_cache(self, name):
+        """Every cached result of project name, by key (oldest first)"""
+        try:
+            with open(self._results_path(name), 'rb') as f:
+                return project_codec.decode(f.read())
+        except Exception:
+            return {}  # אין מטמון, או שהוא פגום - מחשבים מחדש
+
+    def load_results(self, name, key):
+        """Cached results of project name for key (from results_key), or None"""
+        return self.load_results_cache(name).get(key)
+
+    def save_results(self, name, key, results):
+        """
+        Caches results of project name under key. The cache keeps the latest
+        RESULTS_CACHE_ENTRIES input states; profile arrays are stored packed (project_codec).
+        """
+        entries = self.load_results_cache(name)
+        entries.pop(key, None)
+        entries[key] = results
+        return self.save_results_cache(name, entries)
+
+    def save_results_cache(self, name, entries):
+        """Writes the cached results of project name (entries by key, oldest first)"""
+        # הרשומות נשמרות לפי סדר הכנסה - הוותיקות ביותר נמחקות
+        entries = dict(entries)
+        while len(entries) > self.RESULTS_CACHE_ENTRIES:
+            entries.pop(next(iter(entries)))
+        try:
+            self._write_atomic(self._results_path(name), project_codec.encode(entries))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Results cache not saved: {e}")
+            return False
+        return True
+
+    def _project_path(self, name):
+        """Path of the saved project name; without an extension the newest of its format copies"""
+        if self._strip_extension(name) != name:
+            filepath = os.path.join(self.projects_dir, name)
+            return filepath if os.path.exists(filepath) else None
+        candidates = [os.path.join(self.projects_dir, name + ext) for ext in self.EXTENSIONS.values()]
+        candidates = [path for path in candidates if os.path.exists(path)]
+        return max(candidates, key=os.path.getmtime) if candidates else None
+
     def get_existing_projects(self):
         """Scans the directory and returns a list of project names without extensions."""
         files = []
         if os.path.exists(self.projects_dir):
             for f in os.listdir(self.projects_dir):
-                if f.endswith('.json'):
+                if f.endswith(tuple(self.EXTENSIONS.values())):
                     files.append(os.path.splitext(f)[0])
-        return files
\ No newline at end of file
+        # פרויקט השמור בשני הפורמטים מופיע פעם אחת
+        return list(dict.fromkeys(files))
+
+    def get_project_index(self):
+        """
+        Returns one metadata dict per saved project: name, mode, length, num_outlets,
+        total_flow_lh and mtime (seconds since the epoch).
+        Files added, changed or removed outside the app are picked up here: only
+        project files whose size or mtime differ from the index are opened again.
+        """
+        index = self._read_index()
+        changed = False
+        current = {}
+
+        if os.path.exists(self.projects_dir):
+            with os.scandir(self.projects_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(tuple(self.EXTENSIONS.values())) or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    summary = index.get(entry.name)
+                    if summary is None or summary["mtime"] != stat.st_mtime or summary["size"] != stat.st_size:
+                        summary = self._project_summary(os.path.splitext(entry.name)[0],
+                                                        self.open_project(entry.name), stat)
+                        changed = True
+                    current[entry.name] = summary
+
+        if changed or len(current) != len(index):
+            try:
+                self._write_index(current)
+            except OSError:
+                pass
+        return list(current.values())
+
+    def _project_summary(self, name, data, stat):
+        """
+        Index entry of one project file (data is None if the file could not be read).
+        data may come from open_project: the flows are then summed while streaming.
+        """
+        summary = {"name": name, "mode": None, "length": None, "num_outlets": 0,
+                   "total_flow_lh": 0.0, "mtime": stat.st_mtime, "size": stat.st_size}
+        if not isinstance(data, dict):
+            return summary
+
+        summary["mode"] = data.get("mode", "planters")
+        summary["length"] = data.get("length")
+        if summary["mode"] == "direct_soil":
+            # במצב אדמה ישירה המפתח הוא הספיקה והערך הוא כמות הטפטפות
+            drippers = data.get("direct_soil_drippers", {})
+            summary["num_outlets"] = sum(drippers.values())
+            summary["total_flow_lh"] = round(sum(float(flow) * qty for flow, qty in drippers.items()), 2)
+        else:
+            flows = data.get("planter_flows", [])
+            summary["num_outlets"] = data.get("num_outlets", len(flows))
+            summary["total_flow_lh"] = round(sum(flows), 2)
+        return summary
+
+    def _read_index(self):
+        """Index entries by file name; an unreadable or outdated index counts as empty"""
+        try:
+            with open(os.path.join(self.projects_dir, self.INDEX_FILENAME), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(index, dict) or index.get("version") != self.INDEX_VERSION:
+            return {}
+        return index.get("projects", {})
+
+    def _write_index(self, projects):
+        index = {"version": self.INDEX_VERSION, "projects": projects}
+        self._write_atomic(os.path.join(self.projects_dir, self.INDEX_FILENAME),
+                           json.dumps(index, ensure_ascii=False).encode('utf-8'))
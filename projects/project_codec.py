@@ -0,0 +1,109 @@
+"""
+Project Codec Module
+Compact binary encoding of project data: the structure is kept as JSON and every
+numeric list is stored as a packed array, all compressed with zlib
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b"IRPJ"
+FORMAT_VERSION = 1
+
+# כותרת הקובץ: חתימה, גרסת פורמט, ואורך מבנה ה-JSON שבתוך הגוש הדחוס
+_HEADER = struct.Struct("<4sB")
+_LENGTH = struct.Struct("<I")
+_ARRAY_KEY = "__array__"
+
+def is_binary(payload):
+    """True if payload (bytes) starts like a binary project"""
+    return payload[:len(MAGIC)] == MAGIC
+
+def _numeric_types(value):
+    """Element types of value if it is a non-empty list of ints/floats (bools excluded), else None"""
+    if not isinstance(value, list) or not value:
+        return None
+    # set(map(type)) רץ כולו ב-C - פי עשרים מהר יותר מבדיקת isinstance לכל איבר
+    types = set(map(type, value))
+    if all(issubclass(t, (int, float)) and not issubclass(t, bool) for t in types):
+        return types
+    return None
+
+def encode(data, float_typecode="d", level=1):
+    """
+    Encodes project data (dicts, lists and scalars) to bytes.
+    Numeric lists become packed arrays: float_typecode "d" (float64, exact) or "f"
+    (float32, half the size); lists of ints are stored as int64.
+    level is the zlib level: 1 is several times faster than 6 for a slightly larger file.
+    """
+    arrays = []
+
+    def pack(value):
+        if isinstance(value, dict):
+            return {k: pack(v) for k, v in value.items()}
+        types = _numeric_types(value)
+        if types:
+            typecode = "q" if all(issubclass(t, int) for t in types) else float_typecode
+            arrays.append(array(typecode, value))
+            return {_ARRAY_KEY: len(arrays) - 1, "type": typecode, "count": len(value)}
+        if isinstance(value, list):
+            return [pack(v) for v in value]
+        return value
+
+    structure = json.dumps(pack(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    chunks = [_LENGTH.pack(len(structure)), structure]
+    for values in arrays:
+        # המערכים נשמרים תמיד כ-little-endian, ללא תלות במחשב שכתב אותם
+        if sys.byteorder == "big":
+            values.byteswap()
+        chunks.append(values.tobytes())
+    return _HEADER.pack(MAGIC, FORMAT_VERSION) + zlib.compress(b"".join(chunks), level)
+
+def decode(payload):
+    """Decodes bytes written by encode back to project data (arrays become lists)"""
+    magic, version = _HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Not a binary project file")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Binary project format version {version} is newer than supported ({FORMAT_VERSION})")
+
+    body = zlib.decompress(payload[_HEADER.size:])
+    (length,) = _LENGTH.unpack_from(body)
+    offset = _LENGTH.size
+    structure = json.loads(body[offset:offset + length].decode("utf-8"))
+    offset += length
+
+    def unpack(value):
+        if isinstance(value, dict):
+            if _ARRAY_KEY in value:
+                return arrays[value[_ARRAY_KEY]]
+            return {k: unpack(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [unpack(v) for v in value]
+        return value
+
+    # המערכים מופיעים בגוש לפי סדר המספור שלהם
+    arrays = []
+    for info in sorted(_array_infos(structure), key=lambda i: i[_ARRAY_KEY]):
+        values = array(info["type"])
+        size = values.itemsize * info["count"]
+        values.frombytes(body[offset:offset + size])
+        offset += size
+        if sys.byteorder == "big":
+            values.byteswap()
+        arrays.append(values.tolist())
+    return unpack(structure)
+
+def _array_infos(value):
+    if isinstance(value, dict):
+        if _ARRAY_KEY in value:
+            yield value
+        else:
+            for v in value.values():
+                yield from _array_infos(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _array_infos(v)
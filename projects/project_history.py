@@ -0,0 +1,182 @@
+"""
+Project History Module
+Per-project revision history kept as an append-only file of compact deltas,
+with a full snapshot every SNAPSHOT_INTERVAL revisions to bound checkout time
+"""
+
+import json
+import os
+import struct
+import time
+import zlib
+
+MAGIC = b"IRPH"
+FORMAT_VERSION = 1
+
+KIND_SNAPSHOT = 0
+KIND_DELTA = 1
+
+# כותרת הקובץ, וכותרת כל גרסה: מספר גרסה, זמן, סוג (תמונה מלאה / הפרש), אורך התוכן הדחוס
+_FILE_HEADER = struct.Struct("<4sB")
+_RECORD_HEADER = struct.Struct("<IdBI")
+
+def make_delta(old, new):
+    """
+    Delta that turns old into new. Dicts and lists are compared item by item, so the
+    delta only holds what changed (list items are matched by position).
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {k: make_delta(old[k], v) for k, v in new.items() if k in old and old[k] != v}
+        added = {k: v for k, v in new.items() if k not in old}
+        removed = [k for k in old if k not in new]
+        return {"dict": [changed, added, removed]}
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        changed = {i: make_delta(old[i], new[i]) for i in range(common) if old[i] != new[i]}
+        return {"list": [len(new), changed, new[common:]]}
+    return {"value": new}
+
+def apply_delta(old, delta):
+    """Applies a delta from make_delta to old and returns the new value (old is not modified)"""
+    if "value" in delta:
+        return delta["value"]
+    if "dict" in delta:
+        changed, added, removed = delta["dict"]
+        new = {k: v for k, v in old.items() if k not in removed}
+        for k, d in changed.items():
+            new[k] = apply_delta(old[k], d)
+        new.update(added)
+        return new
+    length, changed, tail = delta["list"]
+    new = old[:length - len(tail)] + tail
+    # אחרי מעבר דרך JSON מפתחות האינדקסים הם מחרוזות
+    for i, d in changed.items():
+        new[int(i)] = apply_delta(old[int(i)], d)
+    return new
+
+def list_changes(old, new, path=""):
+    """Flat list of (path, old value, new value) for every changed leaf, e.g. ("planter_flows[3]", 2.0, 4.0)"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for k in list(old) + [k for k in new if k not in old]:
+            sub_path = f"{path}.{k}" if path else str(k)
+            if k not in new:
+                changes.append((sub_path, old[k], None))
+            elif k not in old:
+                changes.append((sub_path, None, new[k]))
+            elif old[k] != new[k]:
+                changes.extend(list_changes(old[k], new[k], sub_path))
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        changes = []
+        for i in range(max(len(old), len(new))):
+            before = old[i] if i < len(old) else None
+            after = new[i] if i < len(new) else None
+            if i >= len(old) or i >= len(new) or before != after:
+                changes.extend(list_changes(before, after, f"{path}[{i}]"))
+        return changes
+    return [(path, old, new)] if old != new else []
+
+
+class ProjectHistory:
+    """
+    Revision history of one project, stored in a single file. Saving appends only the
+    delta from the previous revision, so its cost follows the size of the change.
+    """
+
+    SNAPSHOT_INTERVAL = 50
+
+    def __init__(self, path):
+        self.path = path
+        # הגרסה האחרונה בזיכרון - שמירה נוספת באותה הרצה לא צריכה לשחזר אותה מהקובץ
+        self._head = None
+
+    def _read_records(self, f):
+        """(revision, timestamp, kind, payload offset, payload size) of every complete record"""
+        f.seek(0)
+        header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            return [], 0
+        magic, version = _FILE_HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a project history file")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Project history format version {version} is newer than supported ({FORMAT_VERSION})")
+
+        records = []
+        end = f.seek(0, os.SEEK_END)
+        offset = _FILE_HEADER.size
+        while offset + _RECORD_HEADER.size <= end:
+            f.seek(offset)
+            revision, timestamp, kind, size = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+            payload_offset = offset + _RECORD_HEADER.size
+            if payload_offset + size > end:
+                break  # רשומה קטועה (קריסה באמצע כתיבה) - מתעלמים ממנה
+            records.append((revision, timestamp, kind, payload_offset, size))
+            offset = payload_offset + size
+        return records, offset
+
+    def revisions(self):
+        """One dict per revision: revision, timestamp, kind ("snapshot" / "delta") and stored size in bytes"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            records, _ = self._read_records(f)
+        return [{"revision": rev, "timestamp": ts, "kind": "snapshot" if kind == KIND_SNAPSHOT else "delta",
+                 "size": size} for rev, ts, kind, _, size in records]
+
+    def checkout(self, revision=None):
+        """Project data at revision (the latest one if None)"""
+        if not os.path.exists(self.path):
+            raise ValueError(f"No history at {self.path}")
+
+        with open(self.path, 'rb') as f:
+            records, _ = self._read_records(f)
+            if not records:
+                raise ValueError(f"No revisions in {self.path}")
+            revision = records[-1][0] if revision is None else revision
+            if not 1 <= revision <= len(records):
+                raise ValueError(f"Revision {revision} does not exist (1-{len(records)})")
+
+            # משחזרים מהתמונה המלאה האחרונה שלפני הגרסה המבוקשת
+            start = revision - 1
+            while records[start][2] != KIND_SNAPSHOT:
+                start -= 1
+            data = None
+            for _, _, kind, offset, size in records[start:revision]:
+                f.seek(offset)
+                payload = json.loads(zlib.decompress(f.read(size)).decode('utf-8'))
+                data = payload if kind == KIND_SNAPSHOT else apply_delta(data, payload)
+        return data
+
+    def diff(self, revision_a, revision_b):
+        """Changes from revision_a to revision_b as (path, old value, new value) tuples"""
+        return list_changes(self.checkout(revision_a), self.checkout(revision_b))
+
+    def append(self, data):
+        """Stores data as a new revision (skipped if identical to the latest); returns its number"""
+        # הגרסאות נקראות בחזרה דרך JSON (למשל מפתח 1.0 הופך ל-"1.0") - משווים בצורה הזו
+        data = json.loads(json.dumps(data, ensure_ascii=False))
+        with open(self.path, 'a+b') as f:
+            records, valid_end = self._read_records(f)
+            # הקובץ נפתח להוספה בלבד - כל כתיבה נוספת לסופו, אחרי שנחתך ממנו זנב פגום
+            f.truncate(valid_end if records else 0)
+            if not records:
+                f.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+
+            revision = len(records) + 1
+            if records:
+                head = self._head[1] if self._head and self._head[0] == len(records) else self.checkout(len(records))
+                if head == data:
+                    return len(records)
+            if not records or (revision - 1) % self.SNAPSHOT_INTERVAL == 0:
+                kind, payload = KIND_SNAPSHOT, data
+            else:
+                kind, payload = KIND_DELTA, make_delta(head, data)
+
+            body = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode('utf-8'))
+            f.write(_RECORD_HEADER.pack(revision, time.time(), kind, len(body)) + body)
+            f.flush()
+            os.fsync(f.fileno())
+        self._head = (revision, data)
+        return revision
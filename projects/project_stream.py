@@ -0,0 +1,275 @@
+"""
+Project Stream Module
+Lazy reading of project files: the small top-level values are parsed up front and
+every list is streamed from the file in chunks when it is iterated, so huge projects
+can be listed, previewed and calculated without holding the whole parse in memory
+"""
+
+import json
+import sys
+import zlib
+from array import array
+
+from projects import project_codec
+
+# כמה בתים נקראים (ונפרסים) מהקובץ בכל פעם, וכמה ערכים בכל גוש של רשימה
+READ_SIZE = 1 << 16
+CHUNK_SIZE = 4096
+
+def open_project_file(filepath):
+    """
+    Reads the header of a project file of either format and returns it as a dict.
+    List values are LazyArray objects: their length is known, their items are read
+    from the file only when iterated. Use materialize() for a plain dict.
+    """
+    with open(filepath, 'rb') as f:
+        binary = project_codec.is_binary(f.read(len(project_codec.MAGIC)))
+    return _open_binary(filepath) if binary else _open_json(filepath)
+
+def materialize(value):
+    """Replaces every LazyArray in value by a plain list"""
+    if isinstance(value, LazyArray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: materialize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [materialize(v) for v in value]
+    return value
+
+
+class LazyArray:
+    """
+    A list stored in a project file. len() is free; iterating reads the file again
+    and decodes CHUNK_SIZE items at a time, so memory stays bounded.
+    """
+
+    def __init__(self, length, read_chunks):
+        self.length = length
+        # פונקציה שמחזירה איטרטור חדש על גושי הרשימה מתחילת הקובץ
+        self._read_chunks = read_chunks
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """Yields the items as lists of up to chunk_size items"""
+        pending = []
+        for chunk in self._read_chunks():
+            pending.extend(chunk)
+            while len(pending) >= chunk_size:
+                yield pending[:chunk_size]
+                del pending[:chunk_size]
+        if pending:
+            yield pending
+
+    def tolist(self):
+        items = []
+        for chunk in self._read_chunks():
+            items.extend(chunk)
+        return items
+
+    def __repr__(self):
+        return f"LazyArray(length={self.length})"
+
+# --- פורמט בינארי (project_codec): מבנה ה-JSON בתחילת הגוש הדחוס והמערכים אחריו ---
+
+def _inflate(filepath):
+    """Decompressed body of a binary project, in blocks of at most READ_SIZE bytes"""
+    with open(filepath, 'rb') as f:
+        magic, version = project_codec._HEADER.unpack(f.read(project_codec._HEADER.size))
+        if magic != project_codec.MAGIC:
+            raise ValueError("Not a binary project file")
+        if version > project_codec.FORMAT_VERSION:
+            raise ValueError(f"Binary project format version {version} is newer than supported "
+                             f"({project_codec.FORMAT_VERSION})")
+        inflater = zlib.decompressobj()
+        while not inflater.eof:
+            # max_length מגביל את הפלט - מה שלא נפרס נשאר ב-unconsumed_tail לסיבוב הבא
+            data = inflater.unconsumed_tail or f.read(READ_SIZE)
+            if not data:
+                raise ValueError("Binary project file is truncated")
+            block = inflater.decompress(data, READ_SIZE)
+            if block:
+                yield block
+
+def _read_bytes(blocks, offset, size):
+    """Yields size bytes of the block stream starting at offset, as they are decompressed"""
+    position = 0
+    for block in blocks:
+        start, end = max(offset - position, 0), min(offset + size - position, len(block))
+        position += len(block)
+        if start < end:
+            yield block[start:end]
+        if position >= offset + size:
+            return
+    raise ValueError("Binary project file is truncated")
+
+def _open_binary(filepath):
+    blocks = _inflate(filepath)
+    head = b""
+    for block in blocks:
+        head += block
+        if len(head) >= project_codec._LENGTH.size:
+            (length,) = project_codec._LENGTH.unpack_from(head)
+            if len(head) >= project_codec._LENGTH.size + length:
+                break
+    else:
+        raise ValueError("Binary project file is truncated")
+    blocks.close()
+    offset = project_codec._LENGTH.size
+    structure = json.loads(head[offset:offset + length].decode('utf-8'))
+
+    # מיקום כל מערך בגוש הפרוס לפי סדר המספור שלהם
+    offsets = {}
+    offset += length
+    for info in sorted(project_codec._array_infos(structure), key=lambda i: i[project_codec._ARRAY_KEY]):
+        offsets[info[project_codec._ARRAY_KEY]] = offset
+        offset += array(info["type"]).itemsize * info["count"]
+
+    def read_chunks(info):
+        typecode, count = info["type"], info["count"]
+        itemsize = array(typecode).itemsize
+        rest = b""
+        blocks = _inflate(filepath)
+        try:
+            for data in _read_bytes(blocks, offsets[info[project_codec._ARRAY_KEY]], itemsize * count):
+                data = rest + data
+                usable = len(data) - len(data) % itemsize
+                values = array(typecode)
+                values.frombytes(data[:usable])
+                rest = data[usable:]
+                if sys.byteorder == "big":
+                    values.byteswap()
+                yield values.tolist()
+        finally:
+            blocks.close()
+
+    def unpack(value):
+        if isinstance(value, dict):
+            if project_codec._ARRAY_KEY in value:
+                return LazyArray(value["count"], lambda: read_chunks(value))
+            return {k: unpack(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [unpack(v) for v in value]
+        return value
+
+    return unpack(structure)
+
+# --- JSON: סריקה הדרגתית של האובייקט העליון, רשימות נקראות בגושים ---
+
+_DELIMITERS = ",:]} \t\r\n"
+
+class _JsonReader:
+    """Incremental reader of one JSON object: only the unread part of READ_SIZE blocks is buffered"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.f.read(READ_SIZE)
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        self.eof = not data
+
+    def peek(self):
+        """Next non-whitespace character ('' at the end of the file)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid project file: expected '{char}'")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # ערך שלם מסתיים במפריד; מספר שנחתך בגבול הבלוק (למשל "232." או "1e") ממשיך בבלוק הבא
+            if self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                self.pos = end
+                return value
+            self._fill()
+
+    def list_chunks(self, decode=True):
+        """Reads the list that starts here and yields its items in chunks (with decode=False only their counts)"""
+        self.expect('[')
+        while True:
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            # רשימה שטוחה (מספרים) נפרסת בבת אחת עד הסוגר או עד הפסיק האחרון במאגר
+            close = self.buf.find(']', self.pos)
+            end = close if close >= 0 else self.buf.rfind(',', self.pos)
+            region = self.buf[self.pos:end] if end > self.pos else ""
+            if region and not any(c in region for c in '[{"'):
+                # לספירה מספיק למנות פסיקים - המספרים עצמם לא נפרסים
+                yield json.loads('[' + region + ']') if decode else region.count(',') + 1
+                self.pos = end if close >= 0 else end + 1
+                continue
+            if not region and close < 0 and not self.eof:
+                self._fill()
+                continue
+            item = self.value()
+            yield [item] if decode else 1
+            if self.peek() == ',':
+                self.pos += 1
+
+    def members(self):
+        """Yields the key of every member of the top-level object, positioned at its value"""
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() != ',':
+                self.expect('}')
+                return
+            self.pos += 1
+
+def _open_json(filepath):
+    def read_chunks(target):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            reader = _JsonReader(f)
+            for key in reader.members():
+                if reader.peek() != '[':
+                    reader.value()
+                elif key == target:
+                    yield from reader.list_chunks()
+                    return
+                else:
+                    for _ in reader.list_chunks(decode=False):
+                        pass
+
+    header = {}
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = _JsonReader(f)
+        for key in reader.members():
+            if reader.peek() == '[':
+                # רק סופרים את הפריטים - הערכים עצמם נקראים שוב כשעוברים על הרשימה
+                length = sum(reader.list_chunks(decode=False))
+                header[key] = LazyArray(length, lambda key=key: read_chunks(key))
+            else:
+                header[key] = reader.value()
+    return header
@@ -0,0 +1,172 @@
+"""
+Reports Module
+CSV and PDF reports of a calculation, shared by the results window and the
+headless batch runner (no Qt imports here)
+"""
+
+import csv
+import os
+import tempfile
+from datetime import datetime
+
+from fpdf import FPDF
+
+class PDFReport(FPDF):
+    def header(self):
+        self.set_font('Helvetica', 'B', 15)
+        self.set_text_color(44, 95, 45)
+        self.cell(0, 10, 'Irrigation System Design Report', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Helvetica', 'I', 8)
+        self.set_text_color(128)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+    def chapter_title(self, label):
+        self.set_font('Helvetica', 'B', 12)
+        self.set_fill_color(240, 248, 240)
+        self.set_text_color(44, 95, 45)
+        self.cell(0, 8, f"  {label}", 0, 1, 'L', fill=True)
+        self.ln(2)
+
+    def chapter_body(self, body):
+        self.set_font('Helvetica', '', 10)
+        self.set_text_color(0)
+        self.multi_cell(0, 6, body)
+        self.ln()
+
+def main_pipe_mm(res, mode):
+    return res.get('recommended_pipe_mm') if mode == 'continuous' else res.get('recommended_main_pipe_mm')
+
+def write_csv_report(file_path, inp, res):
+    """Writes the calculation report (BOM, connectors, pressure profile) of inputs inp and results res"""
+    connectors = inp.get('connectors', {})
+    mode = inp.get('mode', 'continuous')
+    pipe_size = main_pipe_mm(res, mode)
+
+    with open(file_path, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(["IRRIGATION SYSTEM CALCULATION REPORT"])
+        writer.writerow(["Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+        writer.writerow([])
+        writer.writerow(["BILL OF MATERIALS (BOM)"])
+        writer.writerow(["Item", "Quantity/Value", "Unit"])
+        writer.writerow(["Main Pipe Diameter", pipe_size, "mm"])
+        writer.writerow(["Total Length", inp.get('length'), "m"])
+
+        if mode == 'planters':
+            writer.writerow(["Spaghetti Pipe", "As needed (per planter)", ""])
+            writer.writerow(["Number of Planters", inp.get('num_outlets'), "units"])
+
+        writer.writerow(["Total System Flow", res.get('total_flow_lh'), "L/h"])
+        writer.writerow(["Required Inlet Pressure", res.get('required_inlet_pressure_bar'), "Bar"])
+
+        writer.writerow([])
+        writer.writerow(["CONNECTORS LIST"])
+        writer.writerow(["Elbows (90 deg)", connectors.get('elbows', 0), "units"])
+        writer.writerow(["T-Connectors", connectors.get('tees', 0), "units"])
+        writer.writerow(["Straight Connectors", connectors.get('straights', 0), "units"])
+
+        writer.writerow([])
+        writer.writerow(["HYDRAULIC DATA - PRESSURE DISTRIBUTION"])
+        writer.writerow(["Distance from Source (m)", "Pressure (Bar)"])
+
+        distances = res.get('graph_data', {}).get('x', [])
+        pressures = res.get('graph_data', {}).get('y', [])
+
+        for d, p in zip(distances, pressures):
+            writer.writerow([f"{d:.2f}", f"{p:.3f}"])
+
+def plot_pressure_profile(axes, graph_data):
+    """Draws the pressure profile of graph_data on matplotlib axes"""
+    x = graph_data['x']
+    y = graph_data['y']
+    axes.cla()
+    axes.plot(x, y, 'o-', color='#2196F3')
+    axes.axhline(y=1.0, color='red', linestyle='--')
+
+    if y:
+        min_y, max_y = min(y), max(y)
+        margin = (max_y - min_y) * 0.1 if max_y != min_y else 0.5
+        axes.set_ylim(min_y - margin, max_y + margin)
+
+    axes.set_xlabel("Distance (m)")
+    axes.set_ylabel("Pressure (Bar)")
+    axes.grid(True, alpha=0.5)
+
+def write_pdf_report(file_path, inp, res, figure=None):
+    """
+    Writes the PDF report of inputs inp and results res. The graph is taken from the
+    matplotlib figure if given, otherwise the pressure profile is drawn off-screen.
+    """
+    if figure is None:
+        # ציור ללא ממשק גרפי (Agg) - מתאים גם להרצה ללא Qt
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=(5, 4), dpi=100)
+        plot_pressure_profile(figure.add_subplot(111), res['graph_data'])
+
+    fd, temp_img = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    try:
+        figure.savefig(temp_img, dpi=150, bbox_inches='tight')
+
+        pdf = PDFReport()
+        pdf.add_page()
+
+        connectors = inp.get('connectors', {})
+        mode = inp.get('mode', 'continuous')
+
+        pdf.chapter_title("Project Overview")
+        date_str = datetime.now().strftime("%d/%m/%Y %H:%M")
+        info_text = (f"Date: {date_str}\n"
+                     f"Garden Length: {inp.get('length')} m\n"
+                     f"Irrigation Mode: {mode.replace('_', ' ').title()}\n"
+                     f"Total Flow: {res.get('total_flow_lh')} L/h")
+        pdf.chapter_body(info_text)
+
+        pdf.chapter_title("System Recommendations")
+
+        pipe_size = main_pipe_mm(res, mode)
+
+        rec_text = (f"Main Pipe Diameter: {pipe_size} mm\n"
+                    f"Required Inlet Pressure: {res.get('required_inlet_pressure_bar')} Bar\n")
+
+        if mode == 'planters':
+             rec_text += f"Secondary Pipe (Spaghetti): {res.get('recommended_planter_pipe')}\n"
+
+        pdf.chapter_body(rec_text)
+
+        pdf.chapter_title("Bill of Materials (BOM)")
+
+        pdf.set_font('Helvetica', 'B', 10)
+        pdf.set_fill_color(200, 200, 200)
+        pdf.cell(100, 7, "Item", 1, 0, 'L', fill=True)
+        pdf.cell(40, 7, "Quantity", 1, 1, 'C', fill=True)
+
+        pdf.set_font('Helvetica', '', 10)
+
+        items = [
+            (f"Main Pipe ({pipe_size}mm)", f"{inp.get('length')} m"),
+            ("Elbow Connectors (90)", str(connectors.get('elbows', 0))),
+            ("T-Connectors", str(connectors.get('tees', 0))),
+            ("Straight Connectors", str(connectors.get('straights', 0))),
+        ]
+
+        if mode == 'planters':
+             items.append(("Drippers / Outlets", str(inp.get('num_outlets'))))
+
+        for name, qty in items:
+            pdf.cell(100, 7, name, 1, 0, 'L')
+            pdf.cell(40, 7, qty, 1, 1, 'C')
+
+        pdf.ln(5)
+
+        pdf.chapter_title("Hydraulic Analysis Graph")
+        pdf.image(temp_img, x=15, w=180)
+
+        pdf.output(file_path)
+    finally:
+        if os.path.exists(temp_img):
+            os.remove(temp_img)